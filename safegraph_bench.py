@@ -0,0 +1,427 @@
+"""Headless benchmarks for the dashboard and ingestion.
+
+Synthetic data is generated at several scales, from today's 54 states up to
+county-level geographies, all with weekly files over seven years. For each
+scale the suite times:
+
+* the view-model table builders,
+* every dashboard section (tables, figures and their serialization), run
+  outside Streamlit with cold and warm caches, and each figure build on its own,
+* a full headless app run with Streamlit's ``AppTest``, plus a rerun and
+  the common widget interactions,
+* ingestion throughput on generated ``.csv.gz`` files.
+
+Timings are taken without tracing; table and section benchmarks get one
+extra traced run for their tracemalloc peak, and the app steps a second,
+traced pass. Ingestion runs in a fresh interpreter, so the peak RSS it
+reports (its own and its workers') belongs to that step alone. Results are
+written as JSON so runs can be compared with ``--baseline``.
+"""
+import argparse
+import contextlib
+import csv
+import gzip
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import safegraph_core
+import safegraph_distribution as distribution
+import safegraph_drilldown as drilldown
+from safegraph_ingest import merge_partials
+from safegraph_search import STATE_NAMES
+
+SCALES = {
+    'states': 54,
+    'metros': 500,
+    'counties': 3000,
+}
+FIRST_WEEK = date(2019, 1, 7)
+WEEKS = 355
+CATEGORIES = [
+    'Restaurants and Other Eating Places', 'Grocery Stores', 'Gasoline Stations',
+    'Museums, Historical Sites, and Similar Institutions', 'General Merchandise Stores',
+    'Health and Personal Care Stores', 'Religious Organizations', 'Elementary and Secondary Schools',
+]
+HEADER = [
+    'placekey', 'location_name', 'top_category', 'region', 'poi_cbg', 'date_range_start',
+    'date_range_end', 'raw_visit_counts', 'raw_visitor_counts', 'visitor_home_cbgs',
+]
+APP_PATH = Path(__file__).with_name('safegraph_dashboard.py')
+
+
+def geographies(n):
+    """State codes up to 54 geographies, synthetic county-style codes beyond that"""
+    states = sorted(STATE_NAMES)[:54]
+    if n <= len(states):
+        return states[:n]
+    return [f'C{i:05d}' for i in range(n)]
+
+
+def synthetic_partials(n_geos, n_weeks=WEEKS, seed=0):
+    """Ingestion partials for one file per week, as if parsed from raw data"""
+    rng = np.random.default_rng(seed)
+    geos = geographies(n_geos)
+    scale = rng.lognormal(8, 1.2, n_geos)
+    partials = []
+    for w in range(n_weeks):
+        week = FIRST_WEEK + timedelta(weeks=w)
+        # A few geographies are missing from each file, small ones more often
+        present = rng.random(n_geos) > np.where(scale < np.quantile(scale, 0.05), 0.2, 0.003)
+        counts = rng.poisson(scale * (1 + 0.1 * np.sin(w / 8)))
+        year, iso = str(week.year), week.isoformat()
+        partials.append({
+            'path': f'synthetic/patterns-{iso}.csv.gz',
+            'rows': int(counts[present].sum()),
+            'counts': {geos[i]: {year: int(counts[i])} for i in np.flatnonzero(present)},
+            'weekly': {geos[i]: {iso: int(counts[i])} for i in np.flatnonzero(present)},
+        })
+    return partials
+
+
+def synthetic_distribution(geos, years, pois=64, seed=0):
+    """Visit sketches with one merged summary per geography-year cell"""
+    rng = np.random.default_rng(seed)
+    cells = {}
+    for geo in geos:
+        keys = [f'zzz-{i:03d}@{geo}' for i in range(pois)]
+        for year in years:
+            visits = rng.zipf(1.6, pois)
+            cells[(geo, year)] = {
+                'top': distribution.top_summary(keys, keys, visits),
+                'visits': distribution.digest(visits),
+            }
+    return distribution.VisitDistribution(tuple(geos), tuple(years), cells)
+
+
+def synthetic_detail(detail_dir, states, years, counties=40, seed=0):
+    """Write a drill-down dataset for ``states``, as ingestion would"""
+    rng = np.random.default_rng(seed)
+    counts = {}
+    for year in years:
+        for s, state in enumerate(states):
+            for county in range(counties):
+                for category in CATEGORIES:
+                    n = int(rng.integers(1, 500))
+                    counts[(year, state, f'{s % 56 + 1:02d}{county:03d}', category)] = [n, n * 40]
+    drilldown.write_detail(detail_dir, 'synthetic', counts)
+    return str(detail_dir)
+
+
+def synthetic_data(n_geos, n_weeks=WEEKS, seed=0):
+    """Dashboard data built from synthetic partials"""
+    data = merge_partials(synthetic_partials(n_geos, n_weeks, seed))
+    data['distribution'] = synthetic_distribution(sorted(data['countries']), tuple(data['years']), seed=seed)
+    data['version'] = f'synthetic-{n_geos}-{n_weeks}-{seed}'
+    return data
+
+
+def write_raw_files(out_dir, n_geos, n_files, rows_per_file, seed=0):
+    """Write SafeGraph-style weekly pattern files and return their total row count"""
+    rng = np.random.default_rng(seed)
+    geos = np.array(geographies(n_geos))
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stride = max(1, WEEKS // n_files)
+    for f in range(n_files):
+        week = FIRST_WEEK + timedelta(weeks=f * stride)
+        start = f'{week.isoformat()}T00:00:00-05:00'
+        end = f'{(week + timedelta(days=7)).isoformat()}T00:00:00-05:00'
+        geo_idx = rng.integers(0, n_geos, rows_per_file)
+        regions = geos[geo_idx]
+        counties = rng.integers(1, 200, rows_per_file)
+        categories = rng.integers(0, len(CATEGORIES), rows_per_file)
+        visits = rng.integers(1, 2000, rows_per_file)
+        with gzip.open(out_dir / f'patterns-{week.isoformat()}.csv.gz', 'wt', newline='', compresslevel=1) as handle:
+            writer = csv.writer(handle)
+            writer.writerow(HEADER)
+            for i in range(rows_per_file):
+                cbg = f'{geo_idx[i] % 56 + 1:02d}{counties[i]:03d}{i % 1000000:06d}1'
+                writer.writerow([
+                    f'zzz-{f:03d}@{i:06d}', f'POI {i}', CATEGORIES[categories[i]], regions[i], cbg,
+                    start, end, visits[i], max(1, visits[i] // 3), f'{{"{cbg}": 4}}',
+                ])
+    return n_files * rows_per_file
+
+
+def _rss_bytes(maxrss):
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+@contextlib.contextmanager
+def measure(results, scale, name, trace=False, **extra):
+    """Record the wall time of the enclosed block, and its tracemalloc peak if ``trace``"""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        result = {'scale': scale, 'benchmark': name, 'seconds': seconds, **extra}
+        if trace:
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results.append(result)
+
+
+def _repeat(results, scale, name, func, repeat, before=None):
+    """Keep the median of ``repeat`` timed runs plus the peak of one traced run"""
+    runs = []
+    for _ in range(repeat + 1):
+        if before:
+            before()
+        with measure(runs, scale, name, trace=len(runs) == repeat):
+            func()
+    traced = runs.pop()
+    best = sorted(runs, key=lambda r: r['seconds'])[len(runs) // 2]
+    best['peak_bytes'] = traced['peak_bytes']
+    best['runs'] = [r['seconds'] for r in runs]
+    results.append(best)
+
+
+def bench_views(results, scale, data, selection, repeat):
+    import safegraph_views as views
+
+    states, years = selection
+    builders = {
+        'summary_frame': lambda: views.summary_frame(data),
+        'year_summary_frame': lambda: views.year_summary_frame(data),
+        'detailed_frame': lambda: views.detailed_frame(data['cube']),
+        'geo_frame': lambda: views.geo_frame(data, states),
+        'year_frame': lambda: views.year_frame(data, years),
+        'breakdown_frames': lambda: views.breakdown_frames(data['cube'], states, years),
+        'completeness_frame': lambda: views.completeness_frame(data, states),
+        'distribution_frames': lambda: views.distribution_frames(data['distribution'], states, years),
+    }
+    for name, build in builders.items():
+        _repeat(results, scale, f'views.{name}', build, repeat)
+
+
+def bench_sections(results, scale, data, selection, repeat):
+    """Time each dashboard section body outside Streamlit, with cold and warm caches.
+
+    Each figure build is then timed on its own from the dashboard's
+    ``figure:`` timing spans, over ``repeat`` runs of its section with warm
+    tables but no cached figures.
+    """
+    import streamlit as st
+    import safegraph_dashboard as dashboard
+
+    states, years = selection
+    sections = {
+        'detailed_breakdown_section': (data,),
+        'geographic_tab': (data, states),
+        'temporal_tab': (data, years, states),
+        'breakdown_tab': (data, states, years),
+        'data_quality_tab': (data, states),
+        'drilldown_tab': (data, states, years),
+        'distribution_tab': (data, states, years),
+    }
+    for name, args in sections.items():
+        # Fragments only run inside a script run; call the wrapped body directly
+        body = getattr(dashboard, name).__wrapped__
+        clear = lambda: (st.cache_data.clear(), st.cache_resource.clear())
+        _repeat(results, scale, f'section.{name}.cold', lambda: body(*args), repeat, before=clear)
+        _repeat(results, scale, f'section.{name}.warm', lambda: body(*args), repeat)
+
+        # Spans are only recorded while the timer is on, so the runs above stay untimed
+        figures = {}
+        dashboard.timer.enabled = True
+        try:
+            for _ in range(repeat):
+                # Figures are kept with st.cache_resource, tables with st.cache_data
+                st.cache_resource.clear()
+                dashboard.timer.begin()
+                body(*args)
+                for record in dashboard.timer.records():
+                    if record['name'].startswith('figure:'):
+                        figures.setdefault(record['name'][len('figure:'):], []).append(record['ms'] / 1000)
+        finally:
+            dashboard.timer.enabled = False
+        for figure, runs in figures.items():
+            results.append({
+                'scale': scale, 'benchmark': f'figure.{name}.{figure}',
+                'seconds': sorted(runs)[len(runs) // 2], 'runs': runs,
+            })
+
+
+# Run by bench_ingest in a fresh interpreter; prints the ingest stats and peak RSS
+INGEST_SCRIPT = '''
+import json, resource, sys
+from safegraph_ingest import ingest_directory
+stats = ingest_directory(sys.argv[1], workers=int(sys.argv[2]) or None)['ingest']
+print(json.dumps({
+    'stats': stats,
+    'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'workers_maxrss': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+}))
+'''
+
+
+def bench_ingest(results, scale, raw_dir, rows, workers):
+    """Ingestion in its own interpreter, so its peak RSS isn't that of earlier steps"""
+    completed = subprocess.run(
+        [sys.executable, '-c', INGEST_SCRIPT, str(raw_dir), str(workers or 0)],
+        cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+    )
+    report = json.loads(completed.stdout.splitlines()[-1])
+    stats = report['stats']
+    results.append({
+        'scale': scale, 'benchmark': 'ingest.full', 'seconds': stats['seconds'],
+        'rows': rows, 'workers': stats['workers'], 'rows_per_sec': stats['rows_per_sec'],
+        'max_rss_bytes': _rss_bytes(report['maxrss']),
+        # The largest single worker process
+        'workers_max_rss_bytes': _rss_bytes(report['workers_maxrss']),
+    })
+
+
+def _app_steps(app):
+    return [
+        ('app.cold_run', lambda: app.run()),
+        ('app.rerun', lambda: app.run()),
+        ('app.search_keystroke', lambda: app.text_input[0].input('ca').run()),
+        ('app.state_filter_change', lambda: app.sidebar.multiselect[1].set_value(app.sidebar.multiselect[1].options[:20]).run()),
+        ('app.year_filter_change', lambda: app.sidebar.multiselect[0].set_value(app.sidebar.multiselect[0].options[-3:]).run()),
+    ]
+
+
+def bench_app(results, scale, raw_dir, store_dir, timeout):
+    """Full headless runs of the dashboard on ingested raw files.
+
+    The steps are timed in one pass and traced in a second one with fresh
+    caches, where each step's tracemalloc peak is taken from a reset peak.
+    The second cold run finds the store already built, and parsing happens in
+    worker processes either way, so app peaks cover the dashboard process only.
+    """
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ['SAFEGRAPH_DATA_DIR'] = str(raw_dir)
+    os.environ['SAFEGRAPH_STORE_DIR'] = str(store_dir)
+    os.environ.pop('SAFEGRAPH_CACHE_DIR', None)
+    # safegraph_core reads its configuration from the environment when imported
+    importlib.reload(safegraph_core)
+
+    timed = {}
+    for trace in (False, True):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        app = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        if trace:
+            tracemalloc.start()
+        try:
+            for name, step in _app_steps(app):
+                if trace:
+                    tracemalloc.reset_peak()
+                    step()
+                    timed[name]['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                else:
+                    with measure(results, scale, name):
+                        step()
+                    timed[name] = results[-1]
+                if app.exception:
+                    raise RuntimeError(f"{name}: {app.exception[0].value}")
+        finally:
+            if trace:
+                tracemalloc.stop()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print per-benchmark ratios against a baseline run; return the regressions"""
+    previous = {(r['scale'], r['benchmark']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['scale'], result['benchmark']))
+        if old is None or old['seconds'] <= 0:
+            continue
+        ratio = result['seconds'] / old['seconds']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append((result, ratio))
+        print(f"{result['scale']:>10} {result['benchmark']:<45} {old['seconds']:9.4f}s -> {result['seconds']:9.4f}s  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SafeGraph dashboard and ingestion")
+    parser.add_argument('--scales', default=','.join(SCALES), help=f"comma-separated subset of {', '.join(SCALES)}")
+    parser.add_argument('--select', type=int, default=10, help="states selected in the sidebar (0 = all)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per table/section benchmark")
+    parser.add_argument('--raw-files', type=int, default=52, help="raw files generated for ingestion and app runs")
+    parser.add_argument('--rows-per-geo', type=int, default=4, help="raw rows per geography per file")
+    parser.add_argument('--workers', type=int, default=None, help="ingestion worker processes")
+    parser.add_argument('--timeout', type=float, default=600, help="seconds allowed per AppTest run")
+    parser.add_argument('--skip-app', action='store_true', help="skip raw-file ingestion and AppTest runs")
+    parser.add_argument('--output', default='bench_results.json', help="where to write the JSON results")
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before flagging a regression")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in args.scales.split(','):
+        n_geos = SCALES[scale]
+        print(f"[{scale}] {n_geos} geographies x {WEEKS} weekly files", file=sys.stderr)
+        data = synthetic_data(n_geos)
+        states = tuple(sorted(data['countries']))
+        selection = (states[:args.select] if args.select else states, tuple(data['years']))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # The drill-down only ever reads the selected states' partitions
+            data['detail_dir'] = synthetic_detail(Path(tmp) / 'detail', *selection)
+            bench_views(results, scale, data, selection, args.repeat)
+            bench_sections(results, scale, data, selection, args.repeat)
+
+        if not args.skip_app:
+            with tempfile.TemporaryDirectory() as tmp:
+                raw_dir = Path(tmp) / 'raw'
+                rows = write_raw_files(raw_dir, n_geos, args.raw_files, n_geos * args.rows_per_geo)
+                bench_ingest(results, scale, raw_dir, rows, args.workers)
+                bench_app(results, scale, raw_dir, Path(tmp) / 'store', args.timeout)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Disk-backed cache shared by every dashboard process on a host or volume.
+
+Entries are pickles stored under ``<root>/<data version>/<key>-<code version>.pkl``,
+so neither a new data version nor a deploy that changes the code serves stale
+results. Writes go to a temporary file in the
+same directory and are renamed into place, so readers never see a partial
+entry. Entries expire after a TTL, and the least recently read ones are
+evicted once the cache grows past its size limit.
+
+Run ``python safegraph_cache.py`` before replicas take traffic to load the
+aggregates and the default views into the cache.
+"""
+import argparse
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from safegraph_ingest import STORE_FORMAT
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 1 << 30
+SUFFIX = '.pkl'
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def code_version():
+    """Digest of the store format and the source of every ``safegraph_*`` module.
+
+    Cached builders return results of the view, sketch and ingestion code as
+    well as their own, so any change to that code starts a fresh namespace.
+    """
+    digest = hashlib.sha256(f'format={STORE_FORMAT}'.encode())
+    for path in sorted(Path(__file__).parent.glob('safegraph_*.py')):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+class SharedCache:
+    """Content-addressed pickle cache; a cache without a ``root`` is disabled"""
+
+    def __init__(self, root=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root) if root else None
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.code = code_version() if self.root else None
+
+    @classmethod
+    def from_env(cls):
+        """Configure from ``SAFEGRAPH_CACHE_DIR``, ``SAFEGRAPH_CACHE_TTL`` and ``SAFEGRAPH_CACHE_MAX_MB``"""
+        return cls(
+            os.environ.get('SAFEGRAPH_CACHE_DIR'),
+            ttl=float(os.environ.get('SAFEGRAPH_CACHE_TTL', DEFAULT_TTL)),
+            max_bytes=int(float(os.environ.get('SAFEGRAPH_CACHE_MAX_MB', DEFAULT_MAX_BYTES >> 20)) * (1 << 20))
+        )
+
+    @property
+    def enabled(self):
+        return self.root is not None
+
+    def _path(self, version, key):
+        return self.root / str(version) / f'{key}-{self.code}{SUFFIX}'
+
+    def get(self, version, key, default=None):
+        """Return the cached value, or ``default`` on a miss or expired entry"""
+        if not self.enabled:
+            return default
+        path = self._path(version, key)
+        try:
+            stat = path.stat()
+            if time.time() - stat.st_mtime > self.ttl:
+                return default
+            with open(path, 'rb') as handle:
+                value = pickle.load(handle)
+            # Record the read in atime for LRU eviction; mtime stays the write time for the TTL
+            os.utime(path, (time.time(), stat.st_mtime))
+            return value
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return default
+
+    def contains(self, version, key):
+        """Whether an unexpired entry exists, without loading it"""
+        if not self.enabled:
+            return False
+        try:
+            return time.time() - self._path(version, key).stat().st_mtime <= self.ttl
+        except OSError:
+            return False
+
+    def put(self, version, key, value):
+        """Store ``value`` atomically, then evict anything over the TTL or size limit"""
+        if not self.enabled:
+            return
+        path = self._path(version, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def get_or_compute(self, version, key, compute):
+        missing = object()
+        value = self.get(version, key, missing)
+        if value is missing:
+            value = compute()
+            self.put(version, key, value)
+        return value
+
+    def evict(self):
+        """Drop expired entries, then least recently read ones until under ``max_bytes``"""
+        if not self.enabled or not self.root.is_dir():
+            return
+        now = time.time()
+        entries = []
+        for path in self.root.glob(f'*/*{SUFFIX}'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_atime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+        for version_dir in self.root.iterdir():
+            if version_dir.is_dir() and not any(version_dir.iterdir()):
+                try:
+                    version_dir.rmdir()
+                except OSError:
+                    pass
+
+    def memoize(self, func):
+        """Cache ``func(version, ...)`` results across processes.
+
+        The first argument must be the data version; like ``st.cache_data``,
+        parameters starting with an underscore are left out of the key.
+        """
+        if not self.enabled:
+            return func
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            version, *params = bound.arguments.items()
+            key_parts = [(name, value) for name, value in params if not name.startswith('_')]
+            key = f'{func.__name__}-{_digest(repr(key_parts))}'
+            return self.get_or_compute(version[1], key, lambda: func(*args, **kwargs))
+
+        return wrapper
+
+
+def warm(app_path=None, timeout=600):
+    """Run the dashboard once headlessly so its default views land in the cache"""
+    from streamlit.testing.v1 import AppTest
+
+    app_path = app_path or str(Path(__file__).with_name('safegraph_dashboard.py'))
+    start = time.perf_counter()
+    app = AppTest.from_file(app_path, default_timeout=timeout).run()
+    if app.exception:
+        raise RuntimeError(f"dashboard raised during warm-up: {app.exception[0].value}")
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the shared SafeGraph dashboard cache")
+    parser.add_argument('--app', help="dashboard script to run (default: safegraph_dashboard.py)")
+    parser.add_argument('--timeout', type=float, default=600, help="seconds allowed for the warm-up run")
+    args = parser.parse_args(argv)
+
+    cache = SharedCache.from_env()
+    if not cache.enabled:
+        sys.exit("SAFEGRAPH_CACHE_DIR is not set; nothing to warm")
+    elapsed = warm(args.app, args.timeout)
+    print(f"Warmed {cache.root} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
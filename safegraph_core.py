@@ -0,0 +1,254 @@
+"""Data loading and batch builds for the SafeGraph dashboard, with no UI dependencies.
+
+Configuration comes from the environment, the same as for the dashboard.
+:func:`load_data` returns what the dashboard serves: either the aggregates
+built from the raw files in ``SAFEGRAPH_DATA_DIR``, or the bundled results
+of the last offline analysis. Batch workers can import this module without
+starting Streamlit. Run as a script, it builds the aggregates once, which
+suits a cron job:
+
+    python safegraph_core.py /path/to/safegraph --artifacts /srv/safegraph
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from safegraph_cache import SharedCache
+from safegraph_cube import ObservationCube
+from safegraph_ingest import (
+    CHUNK_SIZE, _write_json, current_version, default_store_dir, ingest_directory, ingest_progressive, store_lock
+)
+
+
+def store_for(data_dir):
+    """``SAFEGRAPH_STORE_DIR`` if set, else the default store inside ``data_dir``"""
+    return Path(os.environ.get('SAFEGRAPH_STORE_DIR') or default_store_dir(data_dir))
+
+
+# Directory of raw SafeGraph .csv.gz files; the bundled results are used when unset
+DATA_DIR = os.environ.get('SAFEGRAPH_DATA_DIR')
+# Manifest and per-file partials, so only new or changed files are parsed on refresh
+STORE_DIR = DATA_DIR and store_for(DATA_DIR)
+# Disk cache shared between replicas; disabled unless SAFEGRAPH_CACHE_DIR is set
+shared_cache = SharedCache.from_env()
+# How often the background refresher looks for new or changed raw files
+REFRESH_SECONDS = float(os.environ.get('SAFEGRAPH_REFRESH_SECONDS', 300))
+# Show estimates from a growing random sample of files while raw data is first parsed
+SAMPLING = os.environ.get('SAFEGRAPH_SAMPLING', '') not in ('', '0')
+
+CURRENT_FILE = 'current.json'
+AGGREGATES_FILE = 'aggregates.json'
+CUBE_DIRNAME = 'cube'
+
+
+def has_raw_data():
+    return bool(DATA_DIR) and Path(DATA_DIR).is_dir()
+
+
+def probe_version():
+    """Version of the stored aggregates if they match the raw files, else ``None``"""
+    return current_version(DATA_DIR, STORE_DIR)
+
+
+def bundled_data():
+    """Results of the last offline analysis, used when no raw data is configured"""
+    data = {
+        'version': 'bundled',
+        'summary': {
+            'files_processed': 355,
+            'total_countries': 54,
+            'total_years': 7,
+            'total_observations': 82258359
+        },
+        'countries': {
+            'AK': {'total_observations': 161531, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'AL': {'total_observations': 1435489, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'AR': {'total_observations': 650754, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'AZ': {'total_observations': 1837518, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'CA': {'total_observations': 9089835, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'CO': {'total_observations': 1555083, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'CT': {'total_observations': 877345, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'DC': {'total_observations': 213756, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'DE': {'total_observations': 295024, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'FL': {'total_observations': 5757769, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'GA': {'total_observations': 2982614, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'GU': {'total_observations': 1018, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 328},
+            'HI': {'total_observations': 360463, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'IA': {'total_observations': 713128, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'ID': {'total_observations': 575163, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'IL': {'total_observations': 3256771, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'IN': {'total_observations': 1901972, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'KS': {'total_observations': 620241, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'KY': {'total_observations': 1237199, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'LA': {'total_observations': 1014531, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'MA': {'total_observations': 1500754, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'MD': {'total_observations': 1533119, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'ME': {'total_observations': 415258, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'MI': {'total_observations': 2532556, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'MN': {'total_observations': 975086, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'MO': {'total_observations': 1263233, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'MS': {'total_observations': 679167, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'MT': {'total_observations': 272116, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'NC': {'total_observations': 2991914, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'ND': {'total_observations': 173484, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'NE': {'total_observations': 396218, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'NH': {'total_observations': 358016, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'NJ': {'total_observations': 2197496, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'NM': {'total_observations': 510081, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'NV': {'total_observations': 815713, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'NY': {'total_observations': 4248586, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'OH': {'total_observations': 3222940, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'OK': {'total_observations': 851591, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'OR': {'total_observations': 1260443, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'PA': {'total_observations': 3176600, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'PR': {'total_observations': 34927, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'RI': {'total_observations': 237627, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'SC': {'total_observations': 1460614, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'SD': {'total_observations': 171842, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'TN': {'total_observations': 1859970, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'TX': {'total_observations': 7347965, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'UT': {'total_observations': 905365, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'VA': {'total_observations': 2309786, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'VI': {'total_observations': 758, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 298},
+            'VT': {'total_observations': 164183, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'WA': {'total_observations': 1917706, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'WI': {'total_observations': 1315724, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
+            'WV': {'total_observations': 449563, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
+            'WY': {'total_observations': 170754, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354}
+        },
+        'years': {
+            '2019': {'total_observations': 12273495, 'countries_present': 54},
+            '2020': {'total_observations': 11752616, 'countries_present': 54},
+            '2021': {'total_observations': 12338129, 'countries_present': 54},
+            '2022': {'total_observations': 12623873, 'countries_present': 54},
+            '2023': {'total_observations': 12624914, 'countries_present': 54},
+            '2024': {'total_observations': 13003950, 'countries_present': 54},
+            '2025': {'total_observations': 7641382, 'countries_present': 54}
+        }
+    }
+    # These results only carry state and year totals, so the state-year cube is estimated
+    data['cube'] = ObservationCube.from_marginals(data)
+    return data
+
+
+def load_data():
+    """The data the dashboard serves"""
+    if not has_raw_data():
+        return bundled_data()
+    # Another replica, or the batch build, may already have built this version
+    version = probe_version()
+    data = shared_cache.get(version, 'data') if version else None
+    if data is None:
+        data = ingest_directory(DATA_DIR, store_dir=STORE_DIR)
+        shared_cache.put(data['version'], 'data', data)
+    return data
+
+
+def load_data_progressively():
+    """Provisional estimates while raw files are parsed, then the exact data"""
+    version = probe_version()
+    data = shared_cache.get(version, 'data') if version else None
+    if data is not None:
+        yield data
+        return
+    for data in ingest_progressive(DATA_DIR, store_dir=STORE_DIR):
+        yield data
+    shared_cache.put(data['version'], 'data', data)
+
+
+def read_current(artifacts_dir):
+    """The ``current.json`` pointer of an artifacts directory, or ``None``"""
+    path = Path(artifacts_dir) / CURRENT_FILE
+    if not path.exists():
+        return None
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def write_artifacts(data, artifacts_dir, keep=2):
+    """Write ``aggregates.json`` and the cube under ``artifacts_dir/<version>/``.
+
+    ``current.json`` is switched to the new version last, so readers never see
+    a half-written build; all but the newest ``keep`` versions are removed.
+    """
+    artifacts_dir = Path(artifacts_dir)
+    target = artifacts_dir / data['version']
+    target.mkdir(parents=True, exist_ok=True)
+    data['cube'].save(target / CUBE_DIRNAME)
+    aggregates = {key: data[key] for key in ('version', 'summary', 'countries', 'years', 'ingest') if key in data}
+    _write_json(target / AGGREGATES_FILE, aggregates, indent=2)
+    current = {'version': data['version'], 'built_at': datetime.now().isoformat()}
+    _write_json(artifacts_dir / CURRENT_FILE, current, indent=2)
+
+    builds = sorted(
+        (path for path in artifacts_dir.iterdir() if path.is_dir() and (path / AGGREGATES_FILE).exists()),
+        key=lambda path: path.stat().st_mtime, reverse=True
+    )
+    for stale in builds[keep:]:
+        if stale != target:
+            shutil.rmtree(stale, ignore_errors=True)
+    return target
+
+
+def build(data_dir, artifacts_dir=None, store_dir=None, workers=None, chunk_size=CHUNK_SIZE,
+          rebuild=False, cache=None):
+    """Bring the store, artifacts and shared cache up to date; returns ``(version, built)``.
+
+    Nothing is parsed when the store already matches the raw files and the
+    artifacts (when requested) are at that version, so it is cheap to run
+    often.
+    """
+    store_dir = store_dir or store_for(data_dir)
+    cache = cache or shared_cache
+    version = None if rebuild else current_version(data_dir, store_dir)
+    if version is not None:
+        current = read_current(artifacts_dir) if artifacts_dir else None
+        up_to_date = artifacts_dir is None or (current is not None and current['version'] == version)
+        if up_to_date and (not cache.enabled or cache.contains(version, 'data')):
+            return version, False
+
+    data = ingest_directory(data_dir, workers=workers, chunk_size=chunk_size, store_dir=store_dir, rebuild=rebuild)
+    if artifacts_dir:
+        write_artifacts(data, artifacts_dir)
+    cache.put(data['version'], 'data', data)
+    return data['version'], True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the SafeGraph aggregates (suitable for cron)")
+    parser.add_argument('data_dir', nargs='?', default=DATA_DIR,
+                        help="directory containing SafeGraph .csv.gz files (default: $SAFEGRAPH_DATA_DIR)")
+    parser.add_argument('--artifacts', help="write aggregates.json and the cube under this directory")
+    parser.add_argument('--store', help="manifest and partials directory (default: $SAFEGRAPH_STORE_DIR, else DATA_DIR/.safegraph)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="rows parsed per chunk")
+    parser.add_argument('--rebuild', action='store_true', help="reparse every file and rebuild the store")
+    parser.add_argument('--warm', action='store_true',
+                        help="afterwards, run the dashboard once (as configured by the environment) to warm the cache")
+    args = parser.parse_args(argv)
+    if not args.data_dir:
+        parser.error("no data directory given and SAFEGRAPH_DATA_DIR is not set")
+
+    store_dir = Path(args.store) if args.store else store_for(args.data_dir)
+    # Overlapping cron runs would parse the same files twice; the second one just exits.
+    # Dashboard replicas take the same lock, and wait for it, whenever they ingest.
+    try:
+        with store_lock(store_dir, blocking=False):
+            version, built = build(args.data_dir, args.artifacts, store_dir, args.workers, args.chunk_size,
+                                   args.rebuild)
+    except BlockingIOError:
+        sys.exit("another build is already running")
+
+    print(f"{'Built' if built else 'Up to date:'} version {version}")
+    if args.warm and shared_cache.enabled:
+        from safegraph_cache import warm
+
+        print(f"Warmed {shared_cache.root} in {warm():.1f}s")
+
+
+if __name__ == "__main__":
+    main()
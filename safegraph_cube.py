@@ -0,0 +1,107 @@
+"""Dense state x year observation counts.
+
+The cube is a 2-D ``int64`` array with integer-coded axes: row ``i`` is
+``states[i]`` and column ``j`` is ``years[j]``. On disk it is a directory
+holding ``counts.npy`` (memory-mappable with ``np.load(mmap_mode='r')``) and a
+small ``axes.json`` with the axis labels.
+"""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+COUNTS_FILE = 'counts.npy'
+AXES_FILE = 'axes.json'
+
+
+@dataclass(frozen=True, eq=False)
+class ObservationCube:
+    states: tuple
+    years: tuple
+    counts: np.ndarray
+    exact: bool = True
+
+    @classmethod
+    def from_partials(cls, partials):
+        """Build an exact cube from per-file ingestion partials"""
+        states = sorted({state for p in partials for state in p['counts']})
+        years = sorted({int(year) for p in partials for ys in p['counts'].values() for year in ys})
+        state_idx = {state: i for i, state in enumerate(states)}
+        year_idx = {year: j for j, year in enumerate(years)}
+
+        counts = np.zeros((len(states), len(years)), dtype=np.int64)
+        for partial in partials:
+            for state, ys in partial['counts'].items():
+                row = counts[state_idx[state]]
+                for year, n in ys.items():
+                    row[year_idx[int(year)]] += n
+        return cls(tuple(states), tuple(years), counts)
+
+    @classmethod
+    def from_marginals(cls, data):
+        """Estimate a cube from state and year totals alone.
+
+        Only used for the bundled results, which carry no state-year detail.
+        """
+        states = sorted(data['countries'])
+        years = sorted(data['years'], key=int)
+        state_totals = np.array([data['countries'][s]['total_observations'] for s in states], dtype=np.int64)
+        year_totals = np.array([data['years'][y]['total_observations'] for y in years], dtype=np.int64)
+        total = max(data['summary']['total_observations'], 1)
+        counts = np.outer(state_totals, year_totals) // total
+        return cls(tuple(states), tuple(int(y) for y in years), counts, exact=False)
+
+    def _indices(self, labels, axis):
+        lookup = {label: i for i, label in enumerate(axis)}
+        return np.array([lookup[label] for label in labels if label in lookup], dtype=np.intp)
+
+    def select(self, states=None, years=None):
+        """Return ``(states, years, counts)`` restricted to the given labels"""
+        if states is None:
+            si = np.arange(len(self.states))
+        else:
+            si = self._indices(states, self.states)
+        if years is None:
+            yi = np.arange(len(self.years))
+        else:
+            yi = self._indices([int(y) for y in years], self.years)
+        states = [self.states[i] for i in si]
+        years = [self.years[j] for j in yi]
+        return states, years, self.counts[np.ix_(si, yi)]
+
+    def frame(self, states=None, years=None):
+        """Wide State x Year DataFrame, ready for a heatmap"""
+        states, years, counts = self.select(states, years)
+        return pd.DataFrame(
+            counts,
+            index=pd.Index(states, name='State'),
+            columns=pd.Index(years, name='Year')
+        )
+
+    def long_frame(self, states=None, years=None):
+        """One row per state-year: ``State``, ``Year``, ``Observations``"""
+        states, years, counts = self.select(states, years)
+        return pd.DataFrame({
+            'State': np.repeat(np.array(states, dtype=object), len(years)),
+            'Year': np.tile(np.array(years, dtype=np.int64), len(states)),
+            'Observations': counts.ravel()
+        })
+
+    def save(self, path):
+        """Write the cube to directory ``path``"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / COUNTS_FILE, np.ascontiguousarray(self.counts, dtype=np.int64))
+        with open(path / AXES_FILE, 'w') as handle:
+            json.dump({'states': list(self.states), 'years': list(self.years), 'exact': self.exact}, handle)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Read a cube written by :meth:`save`, memory-mapping the counts by default"""
+        path = Path(path)
+        with open(path / AXES_FILE) as handle:
+            axes = json.load(handle)
+        counts = np.load(path / COUNTS_FILE, mmap_mode='r' if mmap else None)
+        return cls(tuple(axes['states']), tuple(axes['years']), counts, axes.get('exact', True))
@@ -1,26 +1,35 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import json
-from datetime import datetime
-import gzip
-import csv
-from pathlib import Path
-from collections import defaultdict, Counter
-
-# Page configuration
-st.set_page_config(
-    page_title="SafeGraph Data Analysis Dashboard",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS
-st.markdown("""
+import uuid
+from datetime import timedelta
+
+import safegraph_core as core
+from safegraph_core import shared_cache
+import safegraph_distribution as distribution
+import safegraph_drilldown as drilldown
+import safegraph_export as export
+from safegraph_ingest import DATE_COLUMN, ORIGINS_COLUMN, PLACEKEY_COLUMN
+from safegraph_refresh import SnapshotRefresher
+from safegraph_weekly import lttb
+from safegraph_search import GeographyIndex
+from safegraph_timing import Timer
+import safegraph_views as views
+
+# Timing spans for the debug panel and SAFEGRAPH_TIMING_LOG; off unless SAFEGRAPH_TIMING is set
+timer = Timer.from_env()
+
+def setup_page():
+    # Page configuration
+    st.set_page_config(
+        page_title="SafeGraph Data Analysis Dashboard",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    # Custom CSS
+    st.markdown("""
 <style>
     .main-header {
         font-size: 3rem;
@@ -40,282 +49,102 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load data (you can replace this with your actual data loading)
-@st.cache_data
-def load_safegraph_data():
-    """Load SafeGraph analysis results"""
-    # This is the data from your analysis - you can load from a file or database
-    return {
-        'summary': {
-            'files_processed': 355,
-            'total_countries': 54,
-            'total_years': 7,
-            'total_observations': 82258359
-        },
-        'countries': {
-            'AK': {'total_observations': 161531, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'AL': {'total_observations': 1435489, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'AR': {'total_observations': 650754, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'AZ': {'total_observations': 1837518, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'CA': {'total_observations': 9089835, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'CO': {'total_observations': 1555083, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'CT': {'total_observations': 877345, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'DC': {'total_observations': 213756, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'DE': {'total_observations': 295024, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'FL': {'total_observations': 5757769, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'GA': {'total_observations': 2982614, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'GU': {'total_observations': 1018, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 328},
-            'HI': {'total_observations': 360463, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'IA': {'total_observations': 713128, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'ID': {'total_observations': 575163, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'IL': {'total_observations': 3256771, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'IN': {'total_observations': 1901972, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'KS': {'total_observations': 620241, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'KY': {'total_observations': 1237199, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'LA': {'total_observations': 1014531, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'MA': {'total_observations': 1500754, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'MD': {'total_observations': 1533119, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'ME': {'total_observations': 415258, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'MI': {'total_observations': 2532556, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'MN': {'total_observations': 975086, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'MO': {'total_observations': 1263233, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'MS': {'total_observations': 679167, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'MT': {'total_observations': 272116, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'NC': {'total_observations': 2991914, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'ND': {'total_observations': 173484, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'NE': {'total_observations': 396218, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'NH': {'total_observations': 358016, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'NJ': {'total_observations': 2197496, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'NM': {'total_observations': 510081, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'NV': {'total_observations': 815713, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'NY': {'total_observations': 4248586, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'OH': {'total_observations': 3222940, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'OK': {'total_observations': 851591, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'OR': {'total_observations': 1260443, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'PA': {'total_observations': 3176600, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'PR': {'total_observations': 34927, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'RI': {'total_observations': 237627, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'SC': {'total_observations': 1460614, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'SD': {'total_observations': 171842, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'TN': {'total_observations': 1859970, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'TX': {'total_observations': 7347965, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'UT': {'total_observations': 905365, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'VA': {'total_observations': 2309786, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'VI': {'total_observations': 758, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 298},
-            'VT': {'total_observations': 164183, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'WA': {'total_observations': 1917706, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'WI': {'total_observations': 1315724, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354},
-            'WV': {'total_observations': 449563, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 355},
-            'WY': {'total_observations': 170754, 'years_present': [2019, 2020, 2021, 2022, 2023, 2024, 2025], 'files_with_data': 354}
-        },
-        'years': {
-            '2019': {'total_observations': 12273495, 'countries_present': 54},
-            '2020': {'total_observations': 11752616, 'countries_present': 54},
-            '2021': {'total_observations': 12338129, 'countries_present': 54},
-            '2022': {'total_observations': 12623873, 'countries_present': 54},
-            '2023': {'total_observations': 12624914, 'countries_present': 54},
-            '2024': {'total_observations': 13003950, 'countries_present': 54},
-            '2025': {'total_observations': 7641382, 'countries_present': 54}
-        }
-    }
+# Data loading lives in safegraph_core, so it can run without the UI
+load_safegraph_data = timer.timed('data:load')(core.load_data)
 
-def main():
-    # Load data
-    data = load_safegraph_data()
-    
-    # Header
-    st.markdown('<h1 class="main-header">📊 SafeGraph Data Analysis Dashboard</h1>', unsafe_allow_html=True)
-    
-    # Quick Answer Section
-    st.markdown("---")
-    st.markdown("### 🎯 Quick Answers")
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown("**How many countries?**")
-        st.markdown(f"# {data['summary']['total_countries']}")
-        st.markdown("*US States & Territories*")
-    
-    with col2:
-        st.markdown("**Which countries?**")
-        country_list = sorted(data['countries'].keys())
-        st.markdown(f"**{len(country_list)}** countries including:")
-        st.markdown(f"• **Top 5:** {', '.join(country_list[:5])}")
-        st.markdown(f"• **All:** {', '.join(country_list)}")
-    
-    with col3:
-        st.markdown("**Observations per year?**")
-        year_obs = {year: info['total_observations'] for year, info in data['years'].items()}
-        peak_year = max(year_obs, key=year_obs.get)
-        st.markdown(f"**Peak:** {peak_year} ({year_obs[peak_year]:,})")
-        st.markdown(f"**Range:** {min(year_obs.values()):,} - {max(year_obs.values()):,}")
-    
-    st.markdown("---")
-    
-    # Sidebar
-    st.sidebar.title("🔍 Filters & Controls")
-    
-    # Year filter
-    available_years = sorted(data['years'].keys())
-    selected_years = st.sidebar.multiselect(
-        "Select Years",
-        options=available_years,
-        default=available_years
-    )
-    
-    # State filter
-    available_states = sorted(data['countries'].keys())
-    selected_states = st.sidebar.multiselect(
-        "Select States/Territories",
-        options=available_states,
-        default=available_states[:10]  # Show top 10 by default
-    )
-    
-    # Summary metrics
-    st.subheader("📈 Summary Statistics")
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric(
-            label="Total Observations",
-            value=f"{data['summary']['total_observations']:,}",
-            delta="82.3M"
-        )
-    
-    with col2:
-        st.metric(
-            label="States/Territories",
-            value=data['summary']['total_countries'],
-            delta="54"
-        )
-    
-    with col3:
-        st.metric(
-            label="Years Covered",
-            value=data['summary']['total_years'],
-            delta="2019-2025"
-        )
-    
-    with col4:
-        st.metric(
-            label="Files Processed",
-            value=data['summary']['files_processed'],
-            delta="355"
-        )
-    
-    # Countries and Observations Summary
-    st.subheader("🌍 Countries with Data & Observations per Year")
-    
-    # Create a comprehensive summary table
-    summary_data = []
-    for state, info in data['countries'].items():
-        # Calculate average observations per year
-        avg_per_year = info['total_observations'] / len(info['years_present'])
-        
-        summary_data.append({
-            'Country/State': state,
-            'Total Observations': f"{info['total_observations']:,}",
-            'Years Present': f"{len(info['years_present'])}",
-            'Avg per Year': f"{avg_per_year:,.0f}",
-            'Files with Data': info['files_with_data']
-        })
-    
-    summary_df = pd.DataFrame(summary_data)
-    summary_df = summary_df.sort_values('Total Observations', ascending=False)
-    
-    # Display top 20 countries
-    st.write("**Top 20 Countries/States by Total Observations:**")
-    st.dataframe(
-        summary_df.head(20), 
-        use_container_width=True,
-        hide_index=True
-    )
-    
-    # Yearly breakdown
-    st.subheader("📅 Observations by Year")
-    year_summary_data = []
-    for year, info in data['years'].items():
-        year_summary_data.append({
-            'Year': year,
-            'Total Observations': f"{info['total_observations']:,}",
-            'Countries Present': info['countries_present'],
-            'Avg per Country': f"{info['total_observations'] / info['countries_present']:,.0f}"
-        })
-    
-    year_summary_df = pd.DataFrame(year_summary_data)
-    year_summary_df = year_summary_df.sort_values('Year')
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.write("**Yearly Summary:**")
-        st.dataframe(year_summary_df, use_container_width=True, hide_index=True)
-    
-    with col2:
-        # Quick stats
-        st.write("**Quick Stats:**")
-        st.write(f"• **Total Countries/States:** {len(data['countries'])}")
-        st.write(f"• **Years Covered:** {', '.join(sorted(data['years'].keys()))}")
-        st.write(f"• **Largest State:** {summary_df.iloc[0]['Country/State']} ({summary_df.iloc[0]['Total Observations']} observations)")
-        st.write(f"• **Peak Year:** {year_summary_df.loc[year_summary_df['Total Observations'].str.replace(',', '').astype(int).idxmax(), 'Year']} ({year_summary_df.loc[year_summary_df['Total Observations'].str.replace(',', '').astype(int).idxmax(), 'Total Observations']} observations)")
-    
-    # Detailed country-year breakdown
-    st.subheader("🔍 Detailed Country-Year Breakdown")
-    
-    # Create detailed breakdown table
-    detailed_data = []
-    for state in sorted(data['countries'].keys()):
-        state_info = data['countries'][state]
-        for year in sorted(data['years'].keys()):
-            # Estimate observations for this state-year combination
-            # This is a simplified calculation - in reality you'd have exact data
-            state_total = state_info['total_observations']
-            year_total = data['years'][year]['total_observations']
-            estimated = int(state_total * year_total / data['summary']['total_observations'])
-            
-            detailed_data.append({
-                'Country/State': state,
-                'Year': year,
-                'Observations': f"{estimated:,}"
-            })
-    
-    detailed_df = pd.DataFrame(detailed_data)
-    
-    # Add search functionality
-    search_term = st.text_input("🔍 Search for specific country/state:", placeholder="e.g., CA, TX, New York")
-    
-    if search_term:
-        filtered_df = detailed_df[detailed_df['Country/State'].str.contains(search_term.upper(), case=False)]
-        st.write(f"**Results for '{search_term}':**")
-        st.dataframe(filtered_df, use_container_width=True, hide_index=True)
-    else:
-        # Show first 50 rows by default
-        st.write("**First 50 entries (use search to find specific countries):**")
-        st.dataframe(detailed_df.head(50), use_container_width=True, hide_index=True)
-        
-        if len(detailed_df) > 50:
-            st.write(f"*Showing 50 of {len(detailed_df)} total entries. Use search to find specific countries.*")
-    
-    # Main content tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["🗺️ Geographic Analysis", "📅 Temporal Analysis", "🔍 Detailed Breakdown", "📊 Data Quality"])
+@st.cache_resource
+def get_refresher():
+    # One refresher per process; it loads new data versions in the background
+    probe = core.probe_version if core.has_raw_data() else None
+    if probe and core.SAMPLING:
+        return SnapshotRefresher(core.load_data_progressively, probe=probe, interval=core.REFRESH_SECONDS,
+                                 progressive=True).start()
+    return SnapshotRefresher(load_safegraph_data, probe=probe, interval=core.REFRESH_SECONDS).start()
+
+@st.fragment(run_every=5)
+def provisional_watch(version):
+    # Rerun the page once the estimates have been refined or replaced by exact counts
+    if get_refresher().current().version != version:
+        st.rerun()
+
+# Derived tables are cached per data version and selection, so a rerun only
+# rebuilds the tables whose inputs actually changed. st.cache_data covers this
+# process; the shared disk cache lets other replicas reuse the same results.
+def cached_frame(max_entries):
+    return timer.cached(lambda func: st.cache_data(max_entries=max_entries)(shared_cache.memoize(func)))
+
+@cached_frame(max_entries=8)
+def build_summary_frame(version, _data):
+    return views.summary_frame(_data)
+
+@cached_frame(max_entries=8)
+def build_year_summary_frame(version, _data):
+    return views.year_summary_frame(_data)
+
+@cached_frame(max_entries=8)
+def build_detailed_frame(version, _data):
+    return views.detailed_frame(_data['cube'])
+
+@cached_frame(max_entries=64)
+def build_geo_frame(version, states, _data):
+    return views.geo_frame(_data, states)
+
+@cached_frame(max_entries=64)
+def build_year_frame(version, years, _data):
+    return views.year_frame(_data, years)
+
+@cached_frame(max_entries=64)
+def build_breakdown_frames(version, states, years, _data):
+    return views.breakdown_frames(_data['cube'], states, years)
+
+@cached_frame(max_entries=64)
+def build_distinct_frames(version, states, years, _data):
+    return views.distinct_frames(_data['distinct'], states, years)
+
+@cached_frame(max_entries=64)
+def build_distribution_frames(version, states, years, _data):
+    return views.distribution_frames(_data['distribution'], states, years)
+
+@cached_frame(max_entries=64)
+def build_completeness_frame(version, states, _data):
+    return views.completeness_frame(_data, states)
+
+@timer.cached(st.cache_resource(max_entries=8))
+def build_search_index(version, _data):
+    # Shared across sessions rather than copied per call; the index is never mutated
+    return GeographyIndex(build_detailed_frame(version, _data)['Country/State'])
+
+@timer.cached(st.cache_resource(max_entries=4))
+def open_detail_dataset(version, detail_dir):
+    return drilldown.open_detail(detail_dir)
+
+@cached_frame(max_entries=64)
+def build_county_frame(version, states, years, _dataset):
+    county_df = drilldown.county_frame(_dataset, states, years)
+    return county_df.rename(columns={'county': 'County', 'observations': 'Observations', 'visits': 'Visits'})
+
+@cached_frame(max_entries=64)
+def build_category_frame(version, states, years, county, _dataset):
+    category_df = drilldown.category_frame(_dataset, states, years, county)
+    return category_df.rename(columns={'category': 'POI Category', 'observations': 'Observations', 'visits': 'Visits'})
+
+# Points per series above which weekly charts are downsampled
+MAX_CHART_POINTS = 500
+
+# Figures are cached per data version and selection as well, so a sidebar change
+# only rebuilds the charts whose inputs changed. They are kept with st.cache_resource:
+# st.plotly_chart only reads a figure, so one object is shared instead of copied.
+# Plotly is imported by these builders, so neither importing this module nor first
+# paint waits for it.
+def cached_figure(max_entries):
+    return timer.cached(st.cache_resource(max_entries=max_entries))
+
+@cached_figure(max_entries=32)
+def build_geo_figure(version, states, _data):
+    import plotly.express as px
     
-    with tab1:
-        st.subheader("Geographic Distribution")
-        
-        # Prepare data for geographic visualization
-        geo_data = []
-        for state, info in data['countries'].items():
-            if state in selected_states:
-                geo_data.append({
-                    'State': state,
-                    'Observations': info['total_observations'],
-                    'Files with Data': info['files_with_data']
-                })
-        
-        geo_df = pd.DataFrame(geo_data)
-        
-        # Bar chart
+    geo_df = build_geo_frame(version, states, _data)
+    with timer.span('figure:geo_bar'):
         fig_bar = px.bar(
             geo_df,
             x='State',
@@ -328,29 +157,14 @@ def main():
             xaxis_tickangle=-45,
             height=500
         )
-        st.plotly_chart(fig_bar, use_container_width=True)
-        
-        # Top 10 states
-        st.subheader("Top 10 States by Observations")
-        top_10 = geo_df.nlargest(10, 'Observations')
-        st.dataframe(top_10, use_container_width=True)
+    return fig_bar
+
+@cached_figure(max_entries=32)
+def build_year_line_figure(version, years, _data):
+    import plotly.express as px
     
-    with tab2:
-        st.subheader("Temporal Trends")
-        
-        # Prepare year data
-        year_data = []
-        for year, info in data['years'].items():
-            if year in selected_years:
-                year_data.append({
-                    'Year': int(year),
-                    'Observations': info['total_observations'],
-                    'Countries': info['countries_present']
-                })
-        
-        year_df = pd.DataFrame(year_data)
-        
-        # Line chart for observations over time
+    year_df = build_year_frame(version, years, _data)
+    with timer.span('figure:year_line'):
         fig_line = px.line(
             year_df,
             x='Year',
@@ -359,9 +173,14 @@ def main():
             markers=True
         )
         fig_line.update_layout(height=400)
-        st.plotly_chart(fig_line, use_container_width=True)
-        
-        # Countries per year
+    return fig_line
+
+@cached_figure(max_entries=32)
+def build_year_countries_figure(version, years, _data):
+    import plotly.express as px
+    
+    year_df = build_year_frame(version, years, _data)
+    with timer.span('figure:year_countries'):
         fig_countries = px.bar(
             year_df,
             x='Year',
@@ -371,64 +190,124 @@ def main():
             color_continuous_scale='Greens'
         )
         fig_countries.update_layout(height=400)
-        st.plotly_chart(fig_countries, use_container_width=True)
-    
-    with tab3:
-        st.subheader("Detailed State-Year Breakdown")
-        
-        # Create detailed breakdown
-        breakdown_data = []
-        for state in selected_states:
-            if state in data['countries']:
-                for year in selected_years:
-                    # This would need to be calculated from your actual data
-                    # For now, we'll estimate based on total observations
-                    state_total = data['countries'][state]['total_observations']
-                    year_total = data['years'][year]['total_observations']
-                    estimated = int(state_total * year_total / data['summary']['total_observations'])
-                    
-                    breakdown_data.append({
-                        'State': state,
-                        'Year': int(year),
-                        'Observations': estimated
-                    })
-        
-        breakdown_df = pd.DataFrame(breakdown_data)
-        
-        # Heatmap
-        if not breakdown_df.empty:
-            pivot_df = breakdown_df.pivot(index='State', columns='Year', values='Observations')
-            
-            fig_heatmap = px.imshow(
-                pivot_df,
-                title='Observations by State and Year (Heatmap)',
-                color_continuous_scale='Reds',
-                aspect='auto'
-            )
-            fig_heatmap.update_layout(height=600)
-            st.plotly_chart(fig_heatmap, use_container_width=True)
-        
-        # Data table
-        st.subheader("Detailed Data Table")
-        st.dataframe(breakdown_df, use_container_width=True)
+    return fig_countries
+
+@cached_figure(max_entries=32)
+def build_weekly_figure(version, start, end, states, _data):
+    import plotly.graph_objects as go
+    
+    states, weeks, counts = _data['weekly'].window(start, end, states)
+    if not states or not len(weeks):
+        return None
+    with timer.span('figure:weekly_lines'):
+        # Downsample long series and draw them with WebGL so many states stay responsive
+        keep = lttb(weeks.astype(np.int64), counts, MAX_CHART_POINTS)
+        fig_weekly = go.Figure([
+            go.Scattergl(x=weeks[keep[i]], y=counts[i, keep[i]], mode='lines', name=state)
+            for i, state in enumerate(states)
+        ])
+        fig_weekly.update_layout(title='Weekly Observations', height=450, xaxis_title='Week', yaxis_title='Observations')
+    return fig_weekly
+
+@cached_figure(max_entries=32)
+def build_heatmap_figure(version, states, years, _data):
+    import plotly.express as px
+    
+    breakdown_df, heatmap_df = build_breakdown_frames(version, states, years, _data)
+    if breakdown_df.empty:
+        return None
+    with timer.span('figure:breakdown_heatmap'):
+        fig_heatmap = px.imshow(
+            heatmap_df,
+            title='Observations by State and Year (Heatmap)',
+            color_continuous_scale='Reds',
+            aspect='auto'
+        )
+        fig_heatmap.update_layout(height=600)
+    return fig_heatmap
+
+@cached_figure(max_entries=32)
+def build_county_figure(version, state, years, _dataset):
+    import plotly.express as px
+    
+    county_df = build_county_frame(version, (state,), years, _dataset)
+    with timer.span('figure:county_bar'):
+        fig_counties = px.bar(
+            county_df.head(25),
+            x='County',
+            y='Observations',
+            title=f'Top Counties in {state} by Observations',
+            color='Observations',
+            color_continuous_scale='Purples'
+        )
+        fig_counties.update_layout(xaxis_tickangle=-45, xaxis_type='category', height=450)
+    return fig_counties
+
+@cached_figure(max_entries=32)
+def build_category_figure(version, state, years, county, _dataset):
+    import plotly.express as px
+    
+    category_df = build_category_frame(version, (state,), years, county, _dataset)
+    with timer.span('figure:category_bar'):
+        fig_categories = px.bar(
+            category_df.head(20).iloc[::-1],
+            x='Observations',
+            y='POI Category',
+            orientation='h',
+            title=f'Top POI Categories ({state}{"" if county is None else ", county " + county})'
+        )
+        fig_categories.update_layout(height=500)
+    return fig_categories
+
+@cached_figure(max_entries=32)
+def build_top_pois_figure(version, states, years, _data):
+    import plotly.express as px
+    
+    top_df, _, _ = build_distribution_frames(version, states, years, _data)
+    if top_df.empty:
+        return None
+    with timer.span('figure:top_pois_bar'):
+        labels = top_df['POI'].where(top_df['POI'] != '', top_df['Placekey'])
+        fig_top = px.bar(
+            top_df.assign(Label=labels).head(15).iloc[::-1],
+            x='Visits',
+            y='Label',
+            orientation='h',
+            hover_data=['Placekey'],
+            title='Top POIs by Visits'
+        )
+        fig_top.update_layout(height=500, yaxis_title=None)
+    return fig_top
+
+@cached_figure(max_entries=32)
+def build_quantiles_figure(version, states, years, _data):
+    import plotly.express as px
+    
+    _, _, quantile_df = build_distribution_frames(version, states, years, _data)
+    by_year = quantile_df[quantile_df['State'] != 'All selected']
+    if by_year.empty:
+        return None
+    with timer.span('figure:visit_quantiles'):
+        # Per-year medians across the selected states, one line per quantile
+        yearly = by_year.groupby('Year', sort=False)[list(distribution.QUANTILES)].median().reset_index()
+        fig_quantiles = px.line(
+            yearly.melt(id_vars='Year', var_name='Quantile', value_name='Weekly Visits'),
+            x='Year',
+            y='Weekly Visits',
+            color='Quantile',
+            markers=True,
+            log_y=True,
+            title='Weekly Visits per POI by Year (median across selected states)'
+        )
+        fig_quantiles.update_layout(xaxis_type='category', height=400)
+    return fig_quantiles
+
+@cached_figure(max_entries=32)
+def build_completeness_figure(version, states, _data):
+    import plotly.express as px
     
-    with tab4:
-        st.subheader("Data Quality Metrics")
-        
-        # Data completeness
-        completeness_data = []
-        for state, info in data['countries'].items():
-            if state in selected_states:
-                completeness = (info['files_with_data'] / data['summary']['files_processed']) * 100
-                completeness_data.append({
-                    'State': state,
-                    'Files with Data': info['files_with_data'],
-                    'Completeness %': round(completeness, 2)
-                })
-        
-        completeness_df = pd.DataFrame(completeness_data)
-        
-        # Completeness chart
+    completeness_df = build_completeness_frame(version, states, _data)
+    with timer.span('figure:completeness_bar'):
         fig_completeness = px.bar(
             completeness_df,
             x='State',
@@ -441,24 +320,568 @@ def main():
             xaxis_tickangle=-45,
             height=500
         )
-        st.plotly_chart(fig_completeness, use_container_width=True)
+    return fig_completeness
+
+@cached_figure(max_entries=32)
+def build_gaps_figure(version, states, _data):
+    import plotly.express as px
+    
+    presence = _data['presence']
+    states, present = presence.matrix(states)
+    if not states:
+        return None
+    with timer.span('figure:gap_heatmap'):
+        fig_gaps = px.imshow(
+            present.astype(np.int8),
+            x=list(presence.labels),
+            y=states,
+            title='Files with Data by State (dark = missing)',
+            color_continuous_scale=[[0, '#b2182b'], [1, '#f0f0f0']],
+            zmin=0,
+            zmax=1,
+            aspect='auto'
+        )
+        fig_gaps.update_layout(height=max(250, 22 * len(states)), coloraxis_showscale=False, xaxis_title='File (first week)')
+    return fig_gaps
+
+@cached_figure(max_entries=8)
+def build_volume_figure(version, _data):
+    import plotly.graph_objects as go
+    
+    volume_df = _data['presence'].low_volume_files()
+    with timer.span('figure:file_volume'):
+        fig_volume = go.Figure([
+            go.Scattergl(x=volume_df['Week'], y=volume_df['Observations'], mode='lines', name='Observations'),
+            go.Scattergl(x=volume_df['Week'], y=volume_df['Baseline'], mode='lines', name='Rolling baseline', line={'dash': 'dot'}),
+            go.Scattergl(
+                x=volume_df.loc[volume_df['Anomalous'], 'Week'],
+                y=volume_df.loc[volume_df['Anomalous'], 'Observations'],
+                mode='markers',
+                name='Anomalous',
+                marker={'color': 'red', 'size': 9}
+            ),
+        ])
+        fig_volume.update_layout(title='Observations per File', height=400)
+    return fig_volume
+
+# Tables keep their counts numeric; thousands separators are only applied here, at render time
+COUNT_FORMAT = st.column_config.NumberColumn(format="localized")
+COLUMN_CONFIG = {
+    'Total Observations': COUNT_FORMAT,
+    'Avg per Year': COUNT_FORMAT,
+    'Avg per Country': COUNT_FORMAT,
+    'Observations': COUNT_FORMAT,
+    'Visits': COUNT_FORMAT,
+    'Baseline': COUNT_FORMAT,
+    'Estimate': COUNT_FORMAT,
+    'Low': COUNT_FORMAT,
+    'High': COUNT_FORMAT,
+    'Visits (upper bound)': COUNT_FORMAT,
+    'P50': COUNT_FORMAT,
+    'P90': COUNT_FORMAT,
+    'P99': COUNT_FORMAT,
+    'POI-weeks': COUNT_FORMAT,
+    **{label: COUNT_FORMAT for label in views.DISTINCT_LABELS.values()},
+    **{f'{label} ±': COUNT_FORMAT for label in views.DISTINCT_LABELS.values()},
+    'Completeness %': st.column_config.NumberColumn(format="%.2f%%"),
+}
+
+def export_buttons(name, schema, batches, key):
+    # The file is only generated when a button is clicked, streamed batch by batch from the aggregates
+    columns = st.columns(len(export.FORMATS))
+    for column, (fmt, mime) in zip(columns, export.FORMATS.items()):
+        with column:
+            st.download_button(
+                f"⬇️ Download {fmt.upper()}",
+                data=lambda fmt=fmt: export.export_file(batches(), schema, fmt),
+                file_name=f"{name}.{fmt}",
+                mime=mime,
+                on_click='ignore',
+                key=f"{key}_{fmt}",
+                width='stretch'
+            )
+
+def raw_only_info(data, message, columns=()):
+    # Views built during ingestion are missing from provisional snapshots too, not just the bundled data
+    if data.get('provisional'):
+        st.info("⏳ Still parsing the raw files; this is available once ingestion finishes.")
+    elif 'columns' not in data or not columns:
+        st.info(message)
+    else:
+        # Built from raw files that lack the input columns, or have them but empty
+        missing = [column for column in columns if column not in data['columns']]
+        names = [f"`{column}`" for column in missing or columns]
+        names = ' or '.join(filter(None, [', '.join(names[:-1]), names[-1]]))
+        if missing:
+            st.info(f"None of the raw files has a {names} column, which this view needs.")
+        else:
+            st.info(f"The raw files have no usable values in {names}, which this view needs.")
+
+# Each section below is a fragment: its own widgets rerun only that fragment,
+# and it only builds the tables and figures it displays.
+@st.fragment
+@timer.timed('section:detailed_breakdown')
+def detailed_breakdown_section(data):
+    st.subheader("🔍 Detailed Country-Year Breakdown")
+    
+    detailed_df = build_detailed_frame(data['version'], data)
+    if data.get('provisional'):
+        st.caption("State-year counts are estimated from the files parsed so far; "
+                   "exact counts are shown once ingestion finishes.")
+    elif not data['cube'].exact:
+        st.caption("State-year counts are estimated from state and year totals; "
+                   "set SAFEGRAPH_DATA_DIR to compute exact counts.")
+    
+    # Add search functionality
+    search_term = st.text_input("🔍 Search for specific country/state:", placeholder="e.g., CA, TX, New York")
+    
+    if search_term:
+        search_index = build_search_index(data['version'], data)
+        filtered_df = detailed_df.iloc[search_index.rows(search_term)]
+        st.write(f"**Results for '{search_term}':**")
+        if filtered_df.empty:
+            st.write("*No state or territory matches that code or name.*")
+        else:
+            st.dataframe(filtered_df, width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
+    else:
+        # Show first 50 rows by default
+        st.write("**First 50 entries (use search to find specific countries):**")
+        st.dataframe(detailed_df.head(50), width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
         
-        # Summary statistics
-        st.subheader("Data Quality Summary")
-        col1, col2 = st.columns(2)
+        if len(detailed_df) > 50:
+            st.write(f"*Showing 50 of {len(detailed_df)} total entries. Use search to find specific countries.*")
+
+@st.fragment
+@timer.timed('section:geographic')
+def geographic_tab(data, selected_states):
+    st.subheader("Geographic Distribution")
+    
+    geo_df = build_geo_frame(data['version'], selected_states, data)
+    
+    # Bar chart
+    st.plotly_chart(build_geo_figure(data['version'], selected_states, data), width='stretch')
+    
+    # Top 10 states
+    st.subheader("Top 10 States by Observations")
+    top_10 = geo_df.nlargest(10, 'Observations')
+    st.dataframe(top_10, width='stretch', column_config=COLUMN_CONFIG)
+
+@st.fragment
+@timer.timed('section:temporal')
+def temporal_tab(data, selected_years, selected_states):
+    st.subheader("Temporal Trends")
+    
+    # Line chart for observations over time
+    st.plotly_chart(build_year_line_figure(data['version'], selected_years, data), width='stretch')
+    
+    # Countries per year
+    st.plotly_chart(build_year_countries_figure(data['version'], selected_years, data), width='stretch')
+    
+    # Weekly observations, only available when built from raw files
+    weekly = data.get('weekly')
+    st.subheader("Weekly Observations by State")
+    if weekly is None or len(weekly.weeks) == 0:
+        raw_only_info(data, "Weekly counts are recorded when ingesting raw files; set SAFEGRAPH_DATA_DIR to enable this view.",
+                      (DATE_COLUMN,))
+        return
+    
+    first_week, last_week = weekly.weeks[0].item(), weekly.weeks[-1].item()
+    if first_week == last_week:
+        # A slider needs two distinct ends, so a single week is shown as it is
+        start, end = first_week, last_week
+        st.caption(f"Only the week of {first_week:%Y-%m-%d} has been loaded so far.")
+    else:
+        start, end = st.slider(
+            "Week range",
+            min_value=first_week,
+            max_value=last_week,
+            value=(first_week, last_week),
+            step=timedelta(weeks=1),
+            format="YYYY-MM-DD",
+            key='weekly_range'
+        )
+    
+    # Range totals come straight from the prefix sums, one subtraction per state
+    range_label = f"Observations {start:%Y-%m-%d} to {end:%Y-%m-%d}"
+    with timer.span('table:range_totals'):
+        range_totals = weekly.range_totals(start, end, selected_states).rename(range_label)
+    st.dataframe(
+        range_totals.reset_index(),
+        width='stretch',
+        hide_index=True,
+        column_config={range_label: COUNT_FORMAT}
+    )
+    
+    fig_weekly = build_weekly_figure(data['version'], start, end, selected_states, data)
+    if fig_weekly is not None:
+        st.plotly_chart(fig_weekly, width='stretch')
+
+@st.fragment
+@timer.timed('section:breakdown')
+def breakdown_tab(data, selected_states, selected_years):
+    st.subheader("Detailed State-Year Breakdown")
+    
+    # Slice the state-year cube for the current selection
+    breakdown_df, _ = build_breakdown_frames(data['version'], selected_states, selected_years, data)
+    
+    # Heatmap
+    fig_heatmap = build_heatmap_figure(data['version'], selected_states, selected_years, data)
+    if fig_heatmap is not None:
+        st.plotly_chart(fig_heatmap, width='stretch')
+    
+    # Data table
+    st.subheader("Detailed Data Table")
+    st.dataframe(breakdown_df, width='stretch', column_config=COLUMN_CONFIG)
+    estimated = not data['cube'].exact
+    if estimated:
+        st.caption("These counts are estimates; exported rows are marked `estimated`.")
+    export_buttons(
+        f"safegraph_state_year_{data['version']}{'_estimated' if estimated else ''}",
+        export.cube_schema(),
+        lambda: export.cube_batches(data['cube'], selected_states, selected_years),
+        key='export_state_year'
+    )
+    
+    # Distinct POIs and visitor origins, only available when built from raw files
+    st.subheader("Distinct POIs & Visitor Origins")
+    if 'distinct' not in data or not data['distinct'].states:
+        raw_only_info(data, "Distinct counts are sketched when ingesting raw files; set SAFEGRAPH_DATA_DIR to enable them.",
+                      (PLACEKEY_COLUMN, ORIGINS_COLUMN))
+        return
+    
+    distinct_df, distinct_totals = build_distinct_frames(data['version'], selected_states, selected_years, data)
+    st.caption("Approximate counts from HyperLogLog sketches; ± is the 95% error bound. "
+               "Selection totals count a POI or origin seen in several states or years once.")
+    st.dataframe(distinct_totals, width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
+    st.dataframe(distinct_df, width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
+
+@st.fragment
+@timer.timed('section:drilldown')
+def drilldown_tab(data, selected_states, selected_years):
+    st.subheader("County & POI Category Drill-down")
+    
+    dataset = open_detail_dataset(data['version'], data['detail_dir']) if 'detail_dir' in data else None
+    if dataset is None:
+        raw_only_info(data, "County and POI-category detail is built when ingesting raw files; "
+                            "set SAFEGRAPH_DATA_DIR to enable the drill-down.",
+                      (drilldown.CBG_COLUMN, drilldown.CATEGORY_COLUMN, drilldown.VISITS_COLUMN))
+        return
+    if not selected_states or not selected_years:
+        st.info("Select at least one year and one state/territory in the sidebar.")
+        return
+    
+    # Only the partitions for the chosen state and the selected years are read
+    state = st.selectbox("State/Territory", selected_states, key='drilldown_state')
+    county_df = build_county_frame(data['version'], (state,), selected_years, dataset)
+    st.plotly_chart(build_county_figure(data['version'], state, selected_years, dataset), width='stretch')
+    
+    all_counties = "All counties"
+    county = st.selectbox("County (FIPS)", [all_counties] + county_df['County'].tolist(), key='drilldown_county')
+    county = None if county == all_counties else county
+    category_df = build_category_frame(data['version'], (state,), selected_years, county, dataset)
+    st.plotly_chart(build_category_figure(data['version'], state, selected_years, county, dataset), width='stretch')
+    st.dataframe(category_df, width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
+    
+    # County x category totals for every selected state and year, not just the chart above
+    st.write("**Export county × POI category totals for the selected states and years:**")
+    export_buttons(
+        f"safegraph_county_category_{data['version']}",
+        export.detail_schema(),
+        lambda: export.detail_batches(dataset, selected_states, selected_years),
+        key='export_county_category'
+    )
+
+@st.fragment
+@timer.timed('section:distribution')
+def distribution_tab(data, selected_states, selected_years):
+    st.subheader("Busiest POIs & Visit Distribution")
+    
+    # Summaries sketched during ingestion, so nothing here reads or sorts raw rows
+    if 'distribution' not in data or not data['distribution'].states:
+        raw_only_info(data, "Visit distributions are sketched when ingesting raw files; set SAFEGRAPH_DATA_DIR to enable them.",
+                      (PLACEKEY_COLUMN, drilldown.VISITS_COLUMN))
+        return
+    if not selected_states or not selected_years:
+        st.info("Select at least one year and one state/territory in the sidebar.")
+        return
+    
+    top_df, error, quantile_df = build_distribution_frames(data['version'], selected_states, selected_years, data)
+    
+    st.write("**Busiest POIs by total visits**")
+    st.caption(f"From heavy-hitter sketches: each count is a lower bound, at most {error:,} visits below the true total.")
+    fig_top = build_top_pois_figure(data['version'], selected_states, selected_years, data)
+    if fig_top is not None:
+        st.plotly_chart(fig_top, width='stretch')
+    st.dataframe(top_df, width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
+    
+    st.write("**Weekly visits per POI**")
+    st.caption("Quantiles of raw_visit_counts over POI-weeks, estimated from t-digest-style sketches.")
+    fig_quantiles = build_quantiles_figure(data['version'], selected_states, selected_years, data)
+    if fig_quantiles is not None:
+        st.plotly_chart(fig_quantiles, width='stretch')
+    st.dataframe(quantile_df, width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
+
+@st.fragment
+@timer.timed('section:data_quality')
+def data_quality_tab(data, selected_states):
+    st.subheader("Data Quality Metrics")
+    
+    completeness_df = build_completeness_frame(data['version'], selected_states, data)
+    
+    # Completeness chart
+    st.plotly_chart(build_completeness_figure(data['version'], selected_states, data), width='stretch')
+    
+    # Summary statistics
+    st.subheader("Data Quality Summary")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        avg_completeness = completeness_df['Completeness %'].mean()
+        st.metric("Average Completeness", f"{avg_completeness:.1f}%")
+    
+    with col2:
+        min_completeness = completeness_df['Completeness %'].min()
+        st.metric("Minimum Completeness", f"{min_completeness:.1f}%")
+    
+    # Per-file gaps, only available when built from raw files
+    presence = data.get('presence')
+    st.subheader("Gaps by File")
+    if presence is None:
+        raw_only_info(data, "Per-file presence is recorded when ingesting raw files; set SAFEGRAPH_DATA_DIR to enable gap detection.")
+        return
+    
+    fig_gaps = build_gaps_figure(data['version'], selected_states, data)
+    if fig_gaps is not None:
+        st.plotly_chart(fig_gaps, width='stretch')
         
-        with col1:
-            avg_completeness = completeness_df['Completeness %'].mean()
-            st.metric("Average Completeness", f"{avg_completeness:.1f}%")
+        with timer.span('table:gap_summary'):
+            gaps_df = presence.gap_summary(selected_states)
+        st.dataframe(
+            gaps_df[gaps_df['Files Missing'] > 0],
+            width='stretch',
+            hide_index=True
+        )
+    
+    # Files with unusually few observations compared to the preceding files
+    st.subheader("Low-Volume Files")
+    with timer.span('table:low_volume_files'):
+        volume_df = presence.low_volume_files()
+    st.plotly_chart(build_volume_figure(data['version'], data), width='stretch')
+    
+    anomalous_df = volume_df[volume_df['Anomalous']].drop(columns='Anomalous')
+    if anomalous_df.empty:
+        st.write("*No file falls below half of its rolling baseline.*")
+    else:
+        st.dataframe(anomalous_df, width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
+
+def timing_panel():
+    # Spans from this rerun in the order they started; nested spans are indented
+    records = timer.records()
+    with st.sidebar.expander("⏱️ Rerun Timings"):
+        if not records:
+            st.write("*No spans recorded yet.*")
+            return
+        timing_df = pd.DataFrame({
+            'Span': ['\u2003' * r['depth'] + r['name'] for r in records],
+            'ms': [r['ms'] for r in records],
+            'Cache': [{True: 'hit', False: 'miss'}.get(r.get('hit'), '') for r in records],
+        })
+        top_level = sum(r['ms'] for r in records if r['depth'] == 0)
+        st.caption(f"{len(records)} spans, {top_level:,.1f} ms at top level")
+        st.dataframe(timing_df, width='stretch', hide_index=True,
+                     column_config={'ms': st.column_config.NumberColumn(format="%.2f")})
+
+def main():
+    setup_page()
+    
+    if timer.enabled:
+        # Tag this rerun's spans with the session, so the log can be grouped per rerun
+        session_id = st.session_state.setdefault('timing_session', uuid.uuid4().hex[:12])
+        st.session_state['timing_rerun'] = st.session_state.get('timing_rerun', 0) + 1
+        timer.begin(session=session_id, rerun=st.session_state['timing_rerun'])
+    
+    # Take one snapshot for the whole rerun, so every section shows the same data version
+    with timer.span('data:snapshot'):
+        snapshot = get_refresher().current()
+    data = snapshot.data
+    
+    # Header
+    st.markdown('<h1 class="main-header">📊 SafeGraph Data Analysis Dashboard</h1>', unsafe_allow_html=True)
+    
+    # A data directory with no raw files yet has nothing to summarize
+    if not data['countries'] or not data['years']:
+        st.info("No observations yet: the data directory has no SafeGraph .csv.gz files. "
+                "The dashboard updates once files appear.")
+        return
+    
+    # Quick Answer Section
+    with timer.span('section:quick_answers'):
+        st.markdown("---")
+        st.markdown("### 🎯 Quick Answers")
         
+        # While a sample is being parsed, every figure is an estimate and is labelled as such
+        provisional = data.get('provisional')
+        if provisional:
+            low, high = provisional['intervals']['total_observations']
+            st.warning(
+                f"⏳ **Provisional:** estimated from {provisional['files_parsed']} of {provisional['files']} files "
+                f"(total observations {low:,} - {high:,} at 95% confidence). "
+                "The figures are refined as more files are parsed."
+            )
+            provisional_watch(snapshot.version)
+    
+        col1, col2, col3 = st.columns(3)
+    
+        with col1:
+            st.markdown("**How many countries?**")
+            st.markdown(f"# {data['summary']['total_countries']}")
+            st.markdown("*US States & Territories*" + (" *seen so far*" if provisional else ""))
+    
+        with col2:
+            st.markdown("**Which countries?**")
+            country_list = sorted(data['countries'].keys())
+            st.markdown(f"**{len(country_list)}** countries including:")
+            st.markdown(f"• **Top 5:** {', '.join(country_list[:5])}")
+            st.markdown(f"• **All:** {', '.join(country_list)}")
+    
+        with col3:
+            st.markdown("**Observations per year?**")
+            year_obs = {year: info['total_observations'] for year, info in data['years'].items()}
+            peak_year = max(year_obs, key=year_obs.get)
+            if provisional:
+                low, high = provisional['intervals']['years'][peak_year]
+                st.markdown(f"**Peak (est.):** {peak_year} (~{year_obs[peak_year]:,}, 95% CI {low:,} - {high:,})")
+                st.markdown(f"**Range (est.):** ~{min(year_obs.values()):,} - ~{max(year_obs.values()):,}")
+            else:
+                st.markdown(f"**Peak:** {peak_year} ({year_obs[peak_year]:,})")
+                st.markdown(f"**Range:** {min(year_obs.values()):,} - {max(year_obs.values()):,}")
+    
+        st.markdown("---")
+    
+    # Sidebar
+    with timer.span('section:sidebar'):
+        st.sidebar.title("🔍 Filters & Controls")
+    
+        # Year filter
+        available_years = sorted(data['years'].keys())
+        selected_years = tuple(st.sidebar.multiselect(
+            "Select Years",
+            options=available_years,
+            default=available_years
+        ))
+    
+        # State filter
+        available_states = sorted(data['countries'].keys())
+        selected_states = tuple(st.sidebar.multiselect(
+            "Select States/Territories",
+            options=available_states,
+            default=available_states[:10]  # Show top 10 by default
+        ))
+    
+        # Ingestion throughput, when the data was built from raw files
+        if 'ingest' in data:
+            stats = data['ingest']
+            st.sidebar.caption(
+                f"Parsed {stats['rows']:,} rows from {stats['files_parsed']} of {stats['files']} files in "
+                f"{stats['seconds']:.1f}s ({stats['rows_per_sec']:,.0f} rows/sec)"
+            )
+    
+    # Summary metrics
+    with timer.span('section:metrics'):
+        st.subheader("📈 Summary Statistics")
+        col1, col2, col3, col4 = st.columns(4)
+    
+        with col1:
+            st.metric(
+                label="Total Observations",
+                value=f"{data['summary']['total_observations']:,}"
+            )
+    
         with col2:
-            min_completeness = completeness_df['Completeness %'].min()
-            st.metric("Minimum Completeness", f"{min_completeness:.1f}%")
+            st.metric(
+                label="States/Territories",
+                value=data['summary']['total_countries']
+            )
+    
+        with col3:
+            st.metric(
+                label="Years Covered",
+                value=data['summary']['total_years'],
+                help=f"{min(data['years'], key=int)}-{max(data['years'], key=int)}"
+            )
+    
+        with col4:
+            st.metric(
+                label="Files Processed",
+                value=data['summary']['files_processed']
+            )
+    
+    # Countries and Observations Summary
+    with timer.span('section:summary_tables'):
+        st.subheader("🌍 Countries with Data & Observations per Year")
+    
+        summary_df = build_summary_frame(data['version'], data)
+    
+        # Display top 20 countries
+        st.write("**Top 20 Countries/States by Total Observations:**")
+        st.dataframe(
+            summary_df.head(20), 
+            width='stretch',
+            hide_index=True,
+            column_config=COLUMN_CONFIG
+        )
+    
+        # Yearly breakdown
+        st.subheader("📅 Observations by Year")
+        year_summary_df = build_year_summary_frame(data['version'], data)
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.write("**Yearly Summary:**")
+            st.dataframe(year_summary_df, width='stretch', hide_index=True, column_config=COLUMN_CONFIG)
+    
+        with col2:
+            # Quick stats
+            st.write("**Quick Stats:**")
+            st.write(f"• **Total Countries/States:** {len(data['countries'])}")
+            st.write(f"• **Years Covered:** {', '.join(sorted(data['years'].keys()))}")
+            largest = summary_df.iloc[0]
+            peak = year_summary_df.loc[year_summary_df['Total Observations'].idxmax()]
+            st.write(f"• **Largest State:** {largest['Country/State']} ({largest['Total Observations']:,} observations)")
+            st.write(f"• **Peak Year:** {peak['Year']} ({peak['Total Observations']:,} observations)")
+    
+    # Detailed country-year breakdown
+    detailed_breakdown_section(data)
+    
+    # Main content tabs
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["🗺️ Geographic Analysis", "📅 Temporal Analysis", "🔍 Detailed Breakdown", "📊 Data Quality", "🏙️ County & POI Drill-down", "📈 Distribution"])
+    
+    with tab1:
+        geographic_tab(data, selected_states)
+    
+    with tab2:
+        temporal_tab(data, selected_years, selected_states)
+    
+    with tab3:
+        breakdown_tab(data, selected_states, selected_years)
+    
+    with tab4:
+        data_quality_tab(data, selected_states)
+    
+    with tab5:
+        drilldown_tab(data, selected_states, selected_years)
+    
+    with tab6:
+        distribution_tab(data, selected_states, selected_years)
     
     # Footer
     st.markdown("---")
     st.markdown("**SafeGraph Data Analysis Dashboard** | Generated with Streamlit")
-    st.markdown(f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    st.markdown(f"Last updated: {snapshot.built_at.strftime('%Y-%m-%d %H:%M:%S')} (data version {snapshot.version})")
+    
+    if timer.enabled:
+        timing_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,195 @@
+"""Busiest POIs and the distribution of weekly visits per POI, from mergeable sketches.
+
+Every state x year cell keeps two small summaries of the ``raw_visit_counts``
+column, built chunk by chunk during ingestion and merged across files:
+
+* a heavy-hitter summary: the ``TOP_CAPACITY`` placekeys with the most visits
+  plus an ``error`` bound. Listed counts are lower bounds; a POI's true total
+  is at most its listed count plus ``error``, and a POI that isn't listed has
+  at most ``error`` visits. Merging sums the counts and errors, then truncates
+  back to capacity, adding the largest dropped count to the error.
+* a t-digest-style quantile sketch: centroids (mean, weight) whose sizes are
+  bounded by the arcsine scale function, so they are small in the tails and
+  p99 stays accurate. Merging pools the centroids and compresses them again.
+
+Both stay a few kilobytes per cell however many rows are folded in.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+TOP_CAPACITY = 128
+COMPRESSION = 100
+QUANTILES = {'P50': 0.5, 'P90': 0.9, 'P99': 0.99}
+
+
+def merge_top(summaries, capacity=TOP_CAPACITY):
+    """Merge heavy-hitter summaries; ``None`` entries are skipped"""
+    summaries = [s for s in summaries if s is not None]
+    keys = np.concatenate([np.asarray(s['keys'], dtype=object) for s in summaries])
+    names = np.concatenate([np.asarray(s['names'], dtype=object) for s in summaries])
+    counts = np.concatenate([np.asarray(s['counts'], dtype=np.int64) for s in summaries])
+    error = sum(s['error'] for s in summaries)
+    if len(keys) == 0:
+        return {'keys': [], 'names': [], 'counts': [], 'error': int(error)}
+
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    totals = np.zeros(len(uniq), dtype=np.int64)
+    np.add.at(totals, inverse, counts)
+    order = np.argsort(-totals, kind='stable')
+    if len(order) > capacity:
+        # Nothing dropped here can have more than the largest dropped total
+        error += int(totals[order[capacity]])
+        order = order[:capacity]
+    return {
+        'keys': uniq[order].tolist(),
+        'names': names[first[order]].tolist(),
+        'counts': totals[order].tolist(),
+        'error': int(error),
+    }
+
+
+def top_summary(keys, names, counts, capacity=TOP_CAPACITY):
+    """Heavy-hitter summary of exact ``counts`` per key"""
+    return merge_top([{'keys': keys, 'names': names, 'counts': counts, 'error': 0}], capacity)
+
+
+def _compress(means, weights, lo, hi, compression):
+    order = np.argsort(means, kind='stable')
+    means, weights = means[order], weights[order]
+    total = weights.sum()
+    # Arcsine scale function: a centroid spans at most one unit of k, so
+    # centroids near q=0 and q=1 hold few points and the tails stay precise
+    q = (np.cumsum(weights) - weights / 2) / total
+    k = np.floor(compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+    starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return {
+        'means': merged_means.tolist(),
+        'weights': merged_weights.tolist(),
+        'min': float(lo),
+        'max': float(hi),
+    }
+
+
+def digest(values, compression=COMPRESSION):
+    """Quantile sketch of a batch of values"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return None
+    return _compress(values, np.ones_like(values), values.min(), values.max(), compression)
+
+
+def merge_digests(digests, compression=COMPRESSION):
+    """Merge quantile sketches; ``None`` entries are skipped"""
+    digests = [d for d in digests if d is not None]
+    if not digests:
+        return None
+    return _compress(
+        np.concatenate([np.asarray(d['means'], dtype=np.float64) for d in digests]),
+        np.concatenate([np.asarray(d['weights'], dtype=np.float64) for d in digests]),
+        min(d['min'] for d in digests),
+        max(d['max'] for d in digests),
+        compression
+    )
+
+
+def quantiles(sketch, qs):
+    """Estimated quantiles, interpolating between centroid midpoints and the extremes"""
+    if sketch is None:
+        return np.full(len(qs), np.nan)
+    means = np.asarray(sketch['means'])
+    weights = np.asarray(sketch['weights'])
+    total = weights.sum()
+    mids = np.cumsum(weights) - weights / 2
+    return np.interp(
+        np.asarray(qs) * total,
+        np.r_[0.0, mids, total],
+        np.r_[sketch['min'], means, sketch['max']]
+    )
+
+
+class CellSketch:
+    """Running summaries of one state x year cell while a file is ingested"""
+
+    def __init__(self):
+        self.top = None
+        self.visits = None
+
+    def add(self, keys, names, counts):
+        self.top = merge_top([self.top, top_summary(keys, names, counts)])
+        self.visits = merge_digests([self.visits, digest(counts)])
+
+    def to_json(self):
+        return {'top': self.top, 'visits': self.visits}
+
+
+@dataclass(frozen=True, eq=False)
+class VisitDistribution:
+    states: tuple
+    years: tuple
+    # (state, year) -> {'top': heavy-hitter summary, 'visits': quantile sketch}
+    cells: dict
+
+    @classmethod
+    def from_partials(cls, partials):
+        """Merge the per-file summaries of ingestion partials into one per cell"""
+        pending = {}
+        for partial in partials:
+            for state, ys in partial.get('distribution', {}).items():
+                for year, cell in ys.items():
+                    pending.setdefault((state, year), []).append(cell)
+        cells = {
+            key: {
+                'top': merge_top([c['top'] for c in parts]),
+                'visits': merge_digests([c['visits'] for c in parts]),
+            }
+            for key, parts in pending.items()
+        }
+        states = sorted({state for state, _ in cells})
+        years = sorted({year for _, year in cells}, key=int)
+        return cls(tuple(states), tuple(years), cells)
+
+    def to_partial(self):
+        """The merged summaries in partial form, so they can be merged again later"""
+        nested = {}
+        for (state, year), cell in self.cells.items():
+            nested.setdefault(state, {})[year] = cell
+        return nested
+
+    def _selected(self, states, years):
+        return [
+            (key, cell) for key, cell in sorted(self.cells.items())
+            if key[0] in states and key[1] in years
+        ]
+
+    def top_pois(self, states, years, n=25):
+        """The ``n`` POIs with the most visits across the selection, and the error bound"""
+        selected = self._selected(states, years)
+        merged = merge_top([cell['top'] for _, cell in selected]) if selected else None
+        if merged is None or not merged['keys']:
+            return pd.DataFrame(columns=['Placekey', 'POI', 'Visits', 'Visits (upper bound)']), 0
+        counts = np.asarray(merged['counts'][:n], dtype=np.int64)
+        return pd.DataFrame({
+            'Placekey': merged['keys'][:n],
+            'POI': merged['names'][:n],
+            'Visits': counts,
+            'Visits (upper bound)': counts + merged['error'],
+        }), merged['error']
+
+    def quantile_frame(self, states, years):
+        """Weekly visits per POI: quantiles per state-year cell and for the whole selection"""
+        selected = self._selected(states, years)
+        labels = [(state, year) for (state, year), _ in selected]
+        sketches = [cell['visits'] for _, cell in selected]
+        if selected:
+            labels.append(('All selected', 'All'))
+            sketches.append(merge_digests(sketches))
+        values = np.array([quantiles(s, list(QUANTILES.values())) for s in sketches]).reshape(-1, len(QUANTILES))
+        frame = pd.DataFrame(np.rint(values).astype(np.int64), columns=list(QUANTILES))
+        frame.insert(0, 'Year', [year for _, year in labels])
+        frame.insert(0, 'State', [state for state, _ in labels])
+        frame['POI-weeks'] = [int(round(sum(s['weights']))) if s else 0 for s in sketches]
+        return frame
@@ -0,0 +1,121 @@
+"""County and POI-category drill-down backed by a partitioned Parquet dataset.
+
+During incremental ingestion every raw file contributes one Parquet fragment
+per ``year=YYYY/state=XX`` partition, holding observation and visit counts by
+county (the first five digits of ``poi_cbg``) and ``top_category``. Fragments
+are named after the content hash of their source file, so they are replaced
+and pruned together with the file's partial.
+
+Queries pass the year and state selection as a filter on the partition
+columns, so only the matching directories are read.
+"""
+from pathlib import Path
+
+DETAIL_DIR = 'detail'
+CBG_COLUMN = 'poi_cbg'
+CATEGORY_COLUMN = 'top_category'
+VISITS_COLUMN = 'raw_visit_counts'
+UNKNOWN = 'Unknown'
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([('year', pa.int32()), ('state', pa.string())]), flavor='hive')
+
+
+def write_detail(detail_dir, key, counts):
+    """Write one file's ``{(year, state, county, category): [observations, visits]}`` counts"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if not counts:
+        return
+    keys = list(counts)
+    values = list(counts.values())
+    table = pa.table({
+        'year': pa.array([int(k[0]) for k in keys], pa.int32()),
+        'state': pa.array([k[1] for k in keys], pa.string()),
+        'county': pa.array([k[2] for k in keys], pa.string()),
+        'category': pa.array([k[3] for k in keys], pa.string()),
+        'observations': pa.array([v[0] for v in values], pa.int64()),
+        'visits': pa.array([v[1] for v in values], pa.int64()),
+    })
+    ds.write_dataset(
+        table,
+        detail_dir,
+        format='parquet',
+        partitioning=_partitioning(),
+        basename_template=f'{key}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        # pyarrow refuses more than 1024 partitions per write by default
+        max_partitions=max(1024, len({k[:2] for k in keys}))
+    )
+
+
+def prune_detail(detail_dir, live_keys):
+    """Remove fragments whose source file is no longer in the manifest"""
+    for fragment in Path(detail_dir).rglob('*.parquet'):
+        if fragment.name.split('-', 1)[0] not in live_keys:
+            fragment.unlink()
+
+
+def open_detail(detail_dir):
+    """Open the detail dataset, or return ``None`` if nothing has been written"""
+    import pyarrow.dataset as ds
+
+    detail_dir = Path(detail_dir)
+    if not detail_dir.is_dir() or next(detail_dir.rglob('*.parquet'), None) is None:
+        return None
+    return ds.dataset(detail_dir, format='parquet', partitioning=_partitioning())
+
+
+def _filter(states, years, county=None):
+    import pyarrow.dataset as ds
+
+    expr = ds.field('state').isin(list(states)) & ds.field('year').isin([int(y) for y in years])
+    if county is not None:
+        expr &= ds.field('county') == county
+    return expr
+
+
+def _aggregate(dataset, by, expr):
+    table = dataset.to_table(columns=[by, 'observations', 'visits'], filter=expr)
+    grouped = table.group_by(by).aggregate([('observations', 'sum'), ('visits', 'sum')])
+    frame = grouped.to_pandas().rename(columns={'observations_sum': 'observations', 'visits_sum': 'visits'})
+    return frame.sort_values('observations', ascending=False, ignore_index=True)
+
+
+def county_frame(dataset, states, years):
+    """Observations and visits by county for the selected states and years"""
+    return _aggregate(dataset, 'county', _filter(states, years))
+
+
+def category_frame(dataset, states, years, county=None):
+    """Observations and visits by POI category, optionally within one county"""
+    return _aggregate(dataset, 'category', _filter(states, years, county))
+
+
+def partition_totals(dataset, states, years):
+    """Yield county x category totals per ``year=/state=`` partition of the selection.
+
+    Each partition is read and aggregated on its own, so memory is bounded by
+    the largest partition rather than by the whole selection.
+    """
+    import pyarrow as pa
+
+    for year in sorted(int(y) for y in years):
+        for state in sorted(states):
+            table = dataset.to_table(
+                columns=['county', 'category', 'observations', 'visits'],
+                filter=_filter((state,), (year,))
+            )
+            if table.num_rows == 0:
+                continue
+            grouped = table.group_by(['county', 'category']).aggregate([('observations', 'sum'), ('visits', 'sum')])
+            grouped = grouped.rename_columns(['county', 'category', 'observations', 'visits'])
+            grouped = grouped.sort_by([('county', 'ascending'), ('category', 'ascending')])
+            n = grouped.num_rows
+            grouped = grouped.append_column('year', pa.repeat(pa.scalar(year, pa.int32()), n))
+            yield grouped.append_column('state', pa.repeat(pa.scalar(state, pa.string()), n))
@@ -0,0 +1,102 @@
+"""Streaming CSV and Parquet exports of the aggregates.
+
+Exports are produced as a sequence of Arrow record batches read straight
+from the numeric aggregates (the state x year cube, or the drill-down
+dataset one partition at a time) and written batch by batch to a temporary
+file. No formatted copy of the table is built, and memory use is bounded by
+one batch rather than by the size of the export.
+"""
+import tempfile
+
+import numpy as np
+
+import safegraph_drilldown as drilldown
+
+BATCH_ROWS = 65_536
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def cube_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('state', pa.string()), ('year', pa.int32()), ('observations', pa.int64()), ('estimated', pa.bool_()),
+    ])
+
+
+def cube_batches(cube, states=None, years=None, batch_rows=BATCH_ROWS):
+    """One ``state, year, observations, estimated`` row per selected cube cell, in batches.
+
+    ``estimated`` is set on every row when the cube is not exact (derived from
+    marginal totals, or provisional while files are sampled).
+    """
+    import pyarrow as pa
+
+    schema = cube_schema()
+    states, years, counts = cube.select(states, years)
+    if not states or not years:
+        return
+    state_labels = np.array(states, dtype=object)
+    year_labels = np.array(years, dtype=np.int32)
+    block = max(1, batch_rows // len(years))
+    for lo in range(0, len(states), block):
+        rows = counts[lo:lo + block]
+        yield pa.record_batch([
+            pa.array(np.repeat(state_labels[lo:lo + block], len(years)), pa.string()),
+            pa.array(np.tile(year_labels, len(rows))),
+            pa.array(rows.ravel()),
+            pa.repeat(pa.scalar(not cube.exact), rows.size),
+        ], schema=schema)
+
+
+def detail_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('year', pa.int32()), ('state', pa.string()), ('county', pa.string()),
+        ('category', pa.string()), ('observations', pa.int64()), ('visits', pa.int64()),
+    ])
+
+
+def detail_batches(dataset, states, years):
+    """County x POI-category totals for the selection, one ``year=/state=`` partition at a time"""
+    schema = detail_schema()
+    for table in drilldown.partition_totals(dataset, states, years):
+        for batch in table.select(schema.names).cast(schema).to_batches(max_chunksize=BATCH_ROWS):
+            yield batch
+
+
+def write(batches, schema, fmt, sink):
+    """Write ``batches`` to ``sink`` (a path or binary file) as ``fmt``"""
+    if fmt == 'csv':
+        import pyarrow.csv as pacsv
+
+        with pacsv.CSVWriter(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        with pq.ParquetWriter(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt!r}")
+
+
+def export_file(batches, schema, fmt):
+    """Write the export to an anonymous temporary file and return it, rewound.
+
+    The unbuffered file is returned, which ``st.download_button`` accepts.
+    """
+    handle = tempfile.TemporaryFile()
+    try:
+        write(batches, schema, fmt, handle)
+    except BaseException:
+        handle.close()
+        raise
+    handle.seek(0)
+    return getattr(handle, 'file', handle).detach()
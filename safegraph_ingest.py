@@ -0,0 +1,658 @@
+"""Streaming ingestion of raw SafeGraph ``.csv.gz`` files.
+
+Every file is parsed by a worker process in fixed-size row chunks, so memory
+use is bounded by the chunk size rather than the file size. Each worker
+returns a small per-file partial aggregate, and the partials are merged into
+the ``summary``/``countries``/``years`` structure that the dashboard serves.
+
+When a store directory is given, ingestion is incremental: a manifest records
+the size, mtime and content hash of every processed file, and each file's
+partial is kept on disk, so a refresh only parses new or changed files. The
+merge of all partials is kept as well, so a refresh folds in only the new
+ones; it is redone from the partials when a file is removed or changed.
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+from safegraph_cube import ObservationCube
+import safegraph_distinct as distinct
+import safegraph_distribution as distribution
+import safegraph_drilldown as drilldown
+from safegraph_quality import FilePresence
+import safegraph_sampling as sampling
+from safegraph_weekly import WeeklySeries, week_start
+
+FILE_PATTERN = '*.csv.gz'
+REGION_COLUMN = 'region'
+DATE_COLUMN = 'date_range_start'
+PLACEKEY_COLUMN = 'placekey'
+ORIGINS_COLUMN = 'visitor_home_cbgs'
+NAME_COLUMN = 'location_name'
+CHUNK_SIZE = 50_000
+
+STORE_DIRNAME = '.safegraph'
+MANIFEST_FILE = 'manifest.json'
+MERGED_FILE = 'merged.json'
+LOCK_FILE = 'build.lock'
+LOCK_POLL_SECONDS = 0.5
+# Bumped whenever partials gain new content, so older stores are rebuilt
+STORE_FORMAT = 7
+PARTIALS_DIR = 'partials'
+HASH_BLOCK_SIZE = 1 << 20
+
+# visitor_home_cbgs and similar JSON columns easily exceed the csv default
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def find_data_files(data_dir, pattern=FILE_PATTERN):
+    """Return the raw data files under ``data_dir`` in a stable order"""
+    return sorted(Path(data_dir).rglob(pattern))
+
+
+def default_store_dir(data_dir):
+    """Where incremental ingestion keeps its manifest and partials by default"""
+    return Path(data_dir) / STORE_DIRNAME
+
+
+def file_digest(path):
+    """SHA-256 of a file's raw bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield ``(header, rows)`` chunks of at most ``chunk_size`` CSV rows"""
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as handle:
+        reader = csv.reader(handle)
+        header = next(reader, None)
+        if header is None:
+            return
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            yield header, rows
+
+
+def ingest_file(path, chunk_size=CHUNK_SIZE, detail_dir=None, detail_key=None):
+    """Count observations by state and year in a single file.
+
+    With ``detail_dir``, county x POI-category counts are also written to the
+    drill-down dataset under fragments named ``detail_key``. Placekeys and
+    visitor home CBGs are folded into HyperLogLog sketches per state and year
+    when the file has those columns, and visits per placekey into heavy-hitter
+    and quantile sketches when it also has ``raw_visit_counts``.
+    """
+    counts = Counter()
+    detail = {}
+    sketches = {kind: defaultdict(distinct.new_registers) for kind in distinct.KINDS}
+    visit_sketches = defaultdict(distribution.CellSketch)
+    rows_read = 0
+    columns = []
+    region_idx = date_idx = None
+    detail_idx = placekey_idx = origins_idx = visits_idx = name_idx = None
+
+    for header, rows in iter_chunks(path, chunk_size):
+        if region_idx is None:
+            columns = header
+            try:
+                region_idx = header.index(REGION_COLUMN)
+                date_idx = header.index(DATE_COLUMN)
+            except ValueError as exc:
+                raise ValueError(f"{path}: missing required column ({exc})") from None
+            width = max(region_idx, date_idx) + 1
+            # Rows too short for an optional column are still counted, just not sketched
+            full_width = width
+            detail_columns = (drilldown.CBG_COLUMN, drilldown.CATEGORY_COLUMN, drilldown.VISITS_COLUMN)
+            if detail_dir is not None and all(column in header for column in detail_columns):
+                detail_idx = tuple(header.index(column) for column in detail_columns)
+                full_width = max(full_width, max(detail_idx) + 1)
+            if PLACEKEY_COLUMN in header:
+                placekey_idx = header.index(PLACEKEY_COLUMN)
+                full_width = max(full_width, placekey_idx + 1)
+            if ORIGINS_COLUMN in header:
+                origins_idx = header.index(ORIGINS_COLUMN)
+                full_width = max(full_width, origins_idx + 1)
+            if placekey_idx is not None and drilldown.VISITS_COLUMN in header:
+                visits_idx = header.index(drilldown.VISITS_COLUMN)
+                full_width = max(full_width, visits_idx + 1)
+                if NAME_COLUMN in header:
+                    name_idx = header.index(NAME_COLUMN)
+                    full_width = max(full_width, name_idx + 1)
+
+        rows_read += len(rows)
+        valid = [
+            row for row in rows
+            if len(row) >= width and row[region_idx] and row[date_idx][:4].isdigit()
+        ]
+        # Count by day; years and weeks are rolled up from the few distinct days per file
+        counts.update((row[region_idx], row[date_idx][:10]) for row in valid)
+        if full_width > width:
+            valid = [row for row in valid if len(row) >= full_width]
+
+        if detail_idx is not None:
+            cbg_idx, category_idx, detail_visits_idx = detail_idx
+            for row in valid:
+                key = (
+                    row[date_idx][:4],
+                    row[region_idx],
+                    row[cbg_idx][:5] or drilldown.UNKNOWN,
+                    row[category_idx] or drilldown.UNKNOWN
+                )
+                visits = row[detail_visits_idx]
+                entry = detail.get(key)
+                if entry is None:
+                    entry = detail[key] = [0, 0]
+                entry[0] += 1
+                entry[1] += int(visits) if visits.isdigit() else 0
+
+        # Group the chunk's values by cell, then hash each group in one vectorized pass
+        if placekey_idx is not None or origins_idx is not None:
+            placekeys = defaultdict(list)
+            origins = defaultdict(list)
+            for row in valid:
+                cell = (row[region_idx], row[date_idx][:4])
+                if placekey_idx is not None and row[placekey_idx]:
+                    placekeys[cell].append(row[placekey_idx])
+                if origins_idx is not None and len(row[origins_idx]) > 2:
+                    origins[cell].extend(distinct.ORIGIN_KEY.findall(row[origins_idx]))
+            for kind, groups in (('placekeys', placekeys), ('origins', origins)):
+                for cell, values in groups.items():
+                    distinct.add(sketches[kind][cell], values)
+
+        if placekey_idx is not None and visits_idx is not None:
+            groups = defaultdict(lambda: ([], [], []))
+            for row in valid:
+                visits = row[visits_idx]
+                if row[placekey_idx] and visits.isdigit():
+                    keys, names, values = groups[(row[region_idx], row[date_idx][:4])]
+                    keys.append(row[placekey_idx])
+                    names.append(row[name_idx] if name_idx is not None else '')
+                    values.append(int(visits))
+            for cell, (keys, names, values) in groups.items():
+                visit_sketches[cell].add(keys, names, values)
+
+    if detail:
+        drilldown.write_detail(detail_dir, detail_key, detail)
+
+    state_year = defaultdict(Counter)
+    state_week = defaultdict(Counter)
+    weeks = {}
+    for (state, day), n in counts.items():
+        state_year[state][day[:4]] += n
+        if day not in weeks:
+            weeks[day] = week_start(day)
+        if weeks[day] is not None:
+            state_week[state][weeks[day]] += n
+
+    return {
+        'path': str(path),
+        'rows': rows_read,
+        'columns': columns,
+        'counts': {state: dict(years) for state, years in state_year.items()},
+        'weekly': {state: dict(ws) for state, ws in state_week.items()},
+        'distinct': {
+            kind: _nest({cell: distinct.encode(registers) for cell, registers in cells.items()})
+            for kind, cells in sketches.items()
+        },
+        'distribution': _nest({cell: sketch.to_json() for cell, sketch in visit_sketches.items()}),
+    }
+
+
+def _nest(cells):
+    """``{(state, year): value}`` as ``{state: {year: value}}``"""
+    nested = defaultdict(dict)
+    for (state, year), value in cells.items():
+        nested[state][year] = value
+    return dict(nested)
+
+
+# Partial entries merged into one sketch per cell rather than kept per file
+SKETCH_KEYS = ('distinct', 'distribution')
+
+
+def fold_partials(merged, partials):
+    """Fold per-file partials into ``merged``.
+
+    The small per-file parts (counts and weekly counts) are kept per file, as
+    the presence bitmap needs them; the sketches are merged into the single
+    ``merged['sketches']`` partial.
+    """
+    for partial in partials:
+        merged['files'][partial['path']] = {k: v for k, v in partial.items() if k not in SKETCH_KEYS}
+    if any(key in partial for partial in partials for key in SKETCH_KEYS):
+        both = [merged['sketches']] + list(partials)
+        merged['sketches'] = {
+            'distinct': distinct.DistinctCounts.from_partials(both).to_partial(),
+            'distribution': distribution.VisitDistribution.from_partials(both).to_partial(),
+        }
+    return merged
+
+
+def empty_merged():
+    return {'format': STORE_FORMAT, 'files': {}, 'hashes': {}, 'sketches': {}}
+
+
+def merge_partials(partials, sketches=None):
+    """Merge per-file partials into the dashboard data structure.
+
+    ``sketches``, when given, is a partial holding already merged sketches
+    (see :func:`fold_partials`), used instead of the partials' own.
+    """
+    state_totals = Counter()
+    year_totals = Counter()
+    state_years = defaultdict(set)
+    year_states = defaultdict(set)
+    files_with_data = Counter()
+    sketched = partials if sketches is None else [sketches]
+
+    for partial in partials:
+        for state, years in partial['counts'].items():
+            files_with_data[state] += 1
+            for year, n in years.items():
+                state_totals[state] += n
+                year_totals[year] += n
+                state_years[state].add(int(year))
+                year_states[year].add(state)
+
+    return {
+        'summary': {
+            'files_processed': len(partials),
+            'total_countries': len(state_totals),
+            'total_years': len(year_totals),
+            'total_observations': sum(state_totals.values())
+        },
+        'countries': {
+            state: {
+                'total_observations': state_totals[state],
+                'years_present': sorted(state_years[state]),
+                'files_with_data': files_with_data[state]
+            }
+            for state in sorted(state_totals)
+        },
+        'years': {
+            year: {
+                'total_observations': year_totals[year],
+                'countries_present': len(year_states[year])
+            }
+            for year in sorted(year_totals)
+        },
+        # Columns found in any file, so views can say which input they lack
+        'columns': sorted({column for partial in partials for column in partial.get('columns', ())}),
+        'cube': ObservationCube.from_partials(partials),
+        'weekly': WeeklySeries.from_partials(partials),
+        'presence': FilePresence.from_partials(partials),
+        'distinct': distinct.DistinctCounts.from_partials(sketched),
+        'distribution': distribution.VisitDistribution.from_partials(sketched)
+    }
+
+
+def _read_json(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def _write_json(path, obj, indent=None):
+    """Write JSON via a temporary file so readers never see a partial write"""
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as handle:
+        json.dump(obj, handle, indent=indent)
+    os.replace(tmp, path)
+
+
+def load_manifest(store_dir):
+    """Return the ``{relative path: entry}`` manifest, empty if none exists yet"""
+    path = Path(store_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    manifest = _read_json(path)
+    if manifest.get('format') != STORE_FORMAT:
+        return {}
+    return manifest['files']
+
+
+# Lock files held by the current thread, so nested store_lock calls don't deadlock
+_held_locks = threading.local()
+
+
+def _lock_handle(handle, blocking):
+    """Lock an open file exclusively until it is closed"""
+    try:
+        import fcntl
+    except ImportError:
+        # Windows has no flock; msvcrt only polls, so a blocking lock retries
+        import msvcrt
+        handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if not blocking:
+                    raise BlockingIOError(f"{handle.name} is locked") from None
+                time.sleep(LOCK_POLL_SECONDS)
+    fcntl.flock(handle, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+@contextmanager
+def store_lock(store_dir, blocking=True):
+    """Hold the store's exclusive lock while it is planned, parsed into and committed.
+
+    Every process and thread writing a store takes it, so none can prune
+    partials that another has just committed. Re-entrant within a thread;
+    with ``blocking=False``, raises ``BlockingIOError`` if it is held elsewhere.
+    """
+    if store_dir is None:
+        yield
+        return
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    path = str((store_dir / LOCK_FILE).resolve())
+    held = _held_locks.__dict__.setdefault('paths', set())
+    if path in held:
+        yield
+        return
+    with open(path, 'a') as handle:
+        _lock_handle(handle, blocking)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+
+
+def data_version(identities):
+    """Short content-derived version for a set of file identities"""
+    digest = hashlib.sha256()
+    for identity in sorted(identities):
+        digest.update(identity.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def _manifest_version(entries):
+    return data_version(f"{rel}:{entry['sha256']}" for rel, entry in entries.items())
+
+
+def current_version(data_dir, store_dir):
+    """Version of the stored aggregates if they match ``data_dir``, else ``None``.
+
+    Only stats files and reads the manifest, so it is cheap enough to call on
+    every page load to decide whether previously built results can be reused.
+    """
+    data_dir = Path(data_dir)
+    manifest = load_manifest(store_dir)
+    paths = find_data_files(data_dir)
+    if not manifest or len(paths) != len(manifest):
+        return None
+    for path in paths:
+        entry = manifest.get(path.relative_to(data_dir).as_posix())
+        stat = path.stat()
+        if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+            return None
+    return _manifest_version(manifest)
+
+
+def _run_parallel(func, jobs, workers):
+    """Call ``func(*job)`` for every job tuple, returning results in input order.
+
+    The first element of each job is the path of the file it works on.
+    """
+    if not jobs:
+        return []
+    # Hand out the largest files first so one big file doesn't run alone at the end
+    order = sorted(range(len(jobs)), key=lambda i: jobs[i][0].stat().st_size, reverse=True)
+    columns = list(zip(*(jobs[i] for i in order)))
+    if workers == 1 or len(jobs) == 1:
+        results = list(map(func, *columns))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(func, *columns))
+    ordered = [None] * len(jobs)
+    for i, result in zip(order, results):
+        ordered[i] = result
+    return ordered
+
+
+def _plan_store(data_dir, store_dir, paths, workers, rebuild):
+    """Hash touched files and work out which ones need parsing.
+
+    Returns ``(entries, to_parse)``: the new manifest entries and the
+    ``(rel, path)`` pairs whose partials aren't stored yet.
+    """
+    partials_dir = store_dir / PARTIALS_DIR
+    partials_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {} if rebuild else load_manifest(store_dir)
+    # A missing or outdated manifest means stored partials can't be trusted either
+    rebuild = rebuild or not manifest
+
+    # Unchanged size and mtime: trust the recorded partial without reading the file
+    entries = {}
+    changed = []
+    for path in paths:
+        rel = path.relative_to(data_dir).as_posix()
+        stat = path.stat()
+        entry = manifest.get(rel)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            entries[rel] = entry
+        else:
+            changed.append((rel, path, stat))
+
+    # Touched files are hashed; only content never seen before is parsed
+    digests = _run_parallel(file_digest, [(path,) for _, path, _ in changed], workers)
+    to_parse = []
+    for (rel, path, stat), digest in zip(changed, digests):
+        entries[rel] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': digest}
+        if rebuild or not (partials_dir / f'{digest}.json').exists():
+            to_parse.append((rel, path))
+    return entries, to_parse
+
+
+def _load_merged(store_dir, entries, parsing, rebuild):
+    """The stored merge, brought up to date with every stored partial not being parsed.
+
+    Sketches can't take a file back out, so the merge starts over from the
+    partials when a file it holds was removed or changed (or is reparsed).
+    """
+    path = store_dir / MERGED_FILE
+    merged = None if rebuild or not path.exists() else _read_json(path)
+    if merged is None or merged.get('format') != STORE_FORMAT or any(
+        rel in parsing or entries.get(rel, {}).get('sha256') != digest
+        for rel, digest in merged['hashes'].items()
+    ):
+        merged = empty_merged()
+
+    partials = []
+    for rel in sorted(entries):
+        if rel not in parsing and rel not in merged['hashes']:
+            partial = _read_json(store_dir / PARTIALS_DIR / f"{entries[rel]['sha256']}.json")
+            partial['path'] = rel
+            merged['hashes'][rel] = entries[rel]['sha256']
+            partials.append(partial)
+    return fold_partials(merged, partials)
+
+
+def _commit_store(store_dir, entries, fresh, merged):
+    """Write freshly parsed partials, the merge and the manifest, then prune what no file refers to"""
+    partials_dir = store_dir / PARTIALS_DIR
+    for rel, partial in fresh.items():
+        _write_json(partials_dir / f"{entries[rel]['sha256']}.json", partial)
+    _write_json(store_dir / MERGED_FILE, merged)
+    _write_json(store_dir / MANIFEST_FILE, {'format': STORE_FORMAT, 'files': entries})
+
+    # Drop partials and drill-down fragments that no file refers to any more
+    live = {entry['sha256'] for entry in entries.values()}
+    for orphan in partials_dir.glob('*.json'):
+        if orphan.stem not in live:
+            orphan.unlink()
+    drilldown.prune_detail(store_dir / drilldown.DETAIL_DIR, live)
+    return _manifest_version(entries)
+
+
+def _plan(data_dir, paths, workers, chunk_size, store_dir, rebuild):
+    """Work out what a run has to parse.
+
+    Returns ``(merged, jobs, commit)``: the merge of the partials that can be
+    reused (see :func:`fold_partials`), the ``ingest_file`` argument tuples
+    still to run, and a function that takes the results of those jobs (in job
+    order), folds them into ``merged``, stores them and returns the data version.
+    """
+    merged = empty_merged()
+    if store_dir is None:
+        # Without a manifest there are no content hashes, so file stats stand in
+        version = data_version(
+            f'{path}:{stat.st_size}:{stat.st_mtime_ns}' for path, stat in ((p, p.stat()) for p in paths)
+        )
+
+        def commit(parsed):
+            fold_partials(merged, parsed)
+            return version
+
+        return merged, [(path, chunk_size) for path in paths], commit
+
+    entries, to_parse = _plan_store(data_dir, store_dir, paths, workers, rebuild)
+    merged = _load_merged(store_dir, entries, {rel for rel, _ in to_parse}, rebuild)
+    detail_dir = store_dir / drilldown.DETAIL_DIR
+    jobs = [(path, chunk_size, detail_dir, entries[rel]['sha256']) for rel, path in to_parse]
+
+    def commit(parsed):
+        fresh = dict(zip((rel for rel, _ in to_parse), parsed))
+        for rel, partial in fresh.items():
+            partial['path'] = rel
+            merged['hashes'][rel] = entries[rel]['sha256']
+        fold_partials(merged, parsed)
+        return _commit_store(store_dir, entries, fresh, merged)
+
+    return merged, jobs, commit
+
+
+def _assemble(merged, parsed, version, store_dir, workers, elapsed):
+    """Data for a finished run from its merge, with its version and throughput statistics"""
+    partials = sorted(merged['files'].values(), key=lambda p: p['path'])
+    rows = sum(p['rows'] for p in parsed)
+
+    data = merge_partials(partials, merged['sketches'])
+    data['version'] = version
+    if store_dir is not None:
+        data['detail_dir'] = str(Path(store_dir) / drilldown.DETAIL_DIR)
+    data['ingest'] = {
+        'files': len(partials),
+        'files_parsed': len(parsed),
+        'rows': rows,
+        'workers': workers,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0
+    }
+    return data
+
+
+def ingest_directory(data_dir, workers=None, chunk_size=CHUNK_SIZE, store_dir=None, rebuild=False):
+    """Ingest every raw file under ``data_dir`` using a process pool.
+
+    With ``store_dir``, only files that are new or changed since the last run
+    are parsed and the stored partials of the rest are reused; ``rebuild``
+    forces every file to be parsed again.
+
+    Returns the merged data structure with a ``version`` that changes whenever
+    the input files do, and an ``ingest`` entry holding throughput statistics
+    for the run.
+    """
+    data_dir = Path(data_dir)
+    store_dir = None if store_dir is None else Path(store_dir)
+    paths = find_data_files(data_dir)
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    with store_lock(store_dir):
+        merged, jobs, commit = _plan(data_dir, paths, workers, chunk_size, store_dir, rebuild)
+        parsed = _run_parallel(ingest_file, jobs, workers)
+        version = commit(parsed)
+    return _assemble(merged, parsed, version, store_dir, workers, time.perf_counter() - start)
+
+
+def ingest_progressive(data_dir, workers=None, chunk_size=CHUNK_SIZE, store_dir=None, rebuild=False,
+                       first_batch=None, seed=None):
+    """Like :func:`ingest_directory`, but yield provisional estimates on the way.
+
+    The files that need parsing are processed in random order, in batches
+    that double in size starting from ``first_batch`` files. After every
+    batch but the last, totals are estimated from the files parsed so far
+    (see :func:`safegraph_sampling.estimate`) and yielded. The final item is
+    the exact result, the same as :func:`ingest_directory` returns.
+    """
+    data_dir = Path(data_dir)
+    store_dir = None if store_dir is None else Path(store_dir)
+    paths = find_data_files(data_dir)
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    with store_lock(store_dir):
+        merged, jobs, commit = _plan(data_dir, paths, workers, chunk_size, store_dir, rebuild)
+        known = list(merged['files'].values())
+        order = random.Random(seed).sample(range(len(jobs)), len(jobs))
+        parsed = [None] * len(jobs)
+        batch = max(2, first_batch or workers)
+        done = 0
+        while done < len(jobs):
+            chosen = order[done:done + batch]
+            for i, partial in zip(chosen, _run_parallel(ingest_file, [jobs[i] for i in chosen], workers)):
+                parsed[i] = partial
+            done += len(chosen)
+            batch *= 2
+            if done < len(jobs):
+                sample = [parsed[i] for i in order[:done]]
+                data = sampling.estimate(known, sample, len(jobs))
+                data['version'] = 'provisional-' + data_version(p['path'] for p in known + sample)
+                yield data
+
+        version = commit(parsed)
+    yield _assemble(merged, parsed, version, store_dir, workers, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('data_dir', help="directory containing SafeGraph .csv.gz files")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="rows parsed per chunk")
+    parser.add_argument('--output', help="write the aggregated results to this JSON file")
+    parser.add_argument('--cube-dir', help="write the state x year cube to this directory")
+    parser.add_argument('--store', help=f"manifest and partials directory (default: DATA_DIR/{STORE_DIRNAME})")
+    parser.add_argument('--no-store', action='store_true', help="parse every file without keeping a store")
+    parser.add_argument('--rebuild', action='store_true', help="reparse every file and rebuild the store")
+    args = parser.parse_args(argv)
+
+    store_dir = None if args.no_store else (args.store or default_store_dir(args.data_dir))
+    data = ingest_directory(args.data_dir, workers=args.workers, chunk_size=args.chunk_size,
+                            store_dir=store_dir, rebuild=args.rebuild)
+    stats = data['ingest']
+    print(f"{stats['files']} files ({stats['files_parsed']} parsed), {stats['rows']:,} rows "
+          f"in {stats['seconds']:.1f}s ({stats['rows_per_sec']:,.0f} rows/sec, {stats['workers']} workers)")
+
+    cube = data.pop('cube')
+    for key in ('weekly', 'presence', 'distinct', 'distribution'):
+        data.pop(key)
+    if args.cube_dir:
+        cube.save(args.cube_dir)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(data, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
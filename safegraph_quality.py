@@ -0,0 +1,104 @@
+"""Per-file data quality: which states appear in which files.
+
+``FilePresence`` stores a state x file presence bitmap, packed eight files
+per byte, together with the observation count of every file. Files are
+ordered by the first week they cover, so the file axis is a timeline. Gap
+runs and low-volume files are computed from these arrays in vectorized form,
+without going back to the raw data.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True, eq=False)
+class FilePresence:
+    states: tuple
+    files: tuple
+    labels: tuple
+    bits: np.ndarray
+    file_counts: np.ndarray
+
+    @classmethod
+    def from_partials(cls, partials):
+        """Build the bitmap from ingestion partials"""
+        def first_week(partial):
+            weeks = [week for ws in partial['weekly'].values() for week in ws]
+            return min(weeks) if weeks else ''
+
+        ordered = sorted(partials, key=lambda p: (first_week(p), p['path']))
+        states = sorted({state for p in ordered for state in p['counts']})
+        state_idx = {state: i for i, state in enumerate(states)}
+
+        present = np.zeros((len(states), len(ordered)), dtype=bool)
+        file_counts = np.zeros(len(ordered), dtype=np.int64)
+        for j, partial in enumerate(ordered):
+            for state, years in partial['counts'].items():
+                present[state_idx[state], j] = True
+                file_counts[j] += sum(years.values())
+
+        return cls(
+            states=tuple(states),
+            files=tuple(p['path'] for p in ordered),
+            labels=tuple(first_week(p) or p['path'] for p in ordered),
+            bits=np.packbits(present, axis=1),
+            file_counts=file_counts
+        )
+
+    def matrix(self, states=None):
+        """``(states, present)`` with ``present`` a boolean state x file array"""
+        present = np.unpackbits(self.bits, axis=1, count=len(self.files)).astype(bool)
+        if states is None:
+            return list(self.states), present
+        lookup = {state: i for i, state in enumerate(self.states)}
+        states = [state for state in states if state in lookup]
+        return states, present[[lookup[state] for state in states]]
+
+    def gap_summary(self, states=None):
+        """Missing files and the longest run of consecutive missing files per state"""
+        states, present = self.matrix(states)
+        n_states, n_files = present.shape
+
+        # Pad with "present" on both sides; +1/-1 steps then mark where missing runs start and end.
+        # np.nonzero walks row by row, so the i-th start and i-th end belong to the same run.
+        missing = np.zeros((n_states, n_files + 2), dtype=np.int8)
+        missing[:, 1:-1] = ~present
+        steps = np.diff(missing, axis=1)
+        run_rows, run_starts = np.nonzero(steps == 1)
+        _, run_ends = np.nonzero(steps == -1)
+        run_lengths = run_ends - run_starts
+
+        longest = np.zeros(n_states, dtype=np.int64)
+        np.maximum.at(longest, run_rows, run_lengths)
+        # Among each state's runs, pick the longest (first one on ties)
+        order = np.lexsort((run_starts, -run_lengths, run_rows))
+        first_of_row = np.ones(len(order), dtype=bool)
+        first_of_row[1:] = run_rows[order][1:] != run_rows[order][:-1]
+        longest_start = np.full(n_states, -1, dtype=np.int64)
+        longest_start[run_rows[order][first_of_row]] = run_starts[order][first_of_row]
+
+        labels = np.array(self.labels + ('',), dtype=object)
+        return pd.DataFrame({
+            'State': states,
+            'Files Missing': n_files - present.sum(axis=1),
+            'Longest Missing Run': longest,
+            'Run Starts': labels[longest_start],
+        })
+
+    def low_volume_files(self, window=8, threshold=0.5):
+        """Per-file counts against the rolling median of the preceding ``window`` files.
+
+        Files whose count is below ``threshold`` times that baseline are flagged.
+        """
+        counts = pd.Series(self.file_counts, dtype=np.float64)
+        baseline = counts.rolling(window, min_periods=max(1, window // 2)).median().shift(1)
+        ratio = counts / baseline
+        return pd.DataFrame({
+            'File': self.files,
+            'Week': self.labels,
+            'Observations': self.file_counts,
+            'Baseline': baseline.round().to_numpy(),
+            'Ratio': ratio.round(3).to_numpy(),
+            'Anomalous': (ratio < threshold).to_numpy(),
+        })
@@ -0,0 +1,119 @@
+"""Background data refresh with atomic snapshot swaps.
+
+A ``SnapshotRefresher`` holds one immutable ``Snapshot`` of the loaded data.
+A daemon thread periodically probes for a new data version and, when one
+appears, loads it off the request path and replaces the snapshot with a
+single reference assignment. Readers that already took a snapshot keep using
+it, so a session sees one consistent version until it reruns.
+
+A progressive load yields provisional data before the final result; the
+first item is served right away and the rest are swapped in by a background
+thread as they arrive.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, eq=False)
+class Snapshot:
+    data: dict
+    version: str
+    built_at: datetime
+    provisional: bool = False
+
+
+class SnapshotRefresher:
+    """Serve the latest snapshot built by ``load`` and keep it fresh.
+
+    ``probe`` is a cheap callable returning the current data version, or
+    ``None`` when the data has changed but its version isn't known until it
+    is loaded. Without a probe the first snapshot is kept forever.
+
+    With ``progressive``, ``load`` returns an iterable of data dicts instead:
+    provisional ones (carrying a ``provisional`` entry) and then the final one.
+    """
+
+    def __init__(self, load, probe=None, interval=300, progressive=False):
+        self._load = load
+        self._probe = probe
+        self._interval = interval
+        self._progressive = progressive
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._finishing = None
+
+    def _updates(self):
+        result = self._load()
+        return iter(result if self._progressive else (result,))
+
+    def _build(self, data):
+        return Snapshot(data=data, version=data['version'], built_at=datetime.now(),
+                        provisional='provisional' in data)
+
+    def current(self):
+        """The latest snapshot; only the very first call waits for a load"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    updates = self._updates()
+                    self._snapshot = self._build(next(updates))
+                    if self._snapshot.provisional:
+                        self._finishing = threading.Thread(
+                            target=self._finish, args=(updates,), name='safegraph-progressive', daemon=True
+                        )
+                        self._finishing.start()
+                snapshot = self._snapshot
+        return snapshot
+
+    def _finish(self, updates):
+        # Swap in the refined snapshots of the first load as they arrive
+        try:
+            for data in updates:
+                self._snapshot = self._build(data)
+        except Exception:
+            logger.exception("Progressive data load failed")
+
+    def refresh(self):
+        """Load a new snapshot if the data version moved on; returns whether it swapped"""
+        current = self.current()
+        if self._finishing is not None and self._finishing.is_alive():
+            # The first load is still refining its estimates
+            return False
+        version = self._probe() if self._probe else current.version
+        if version == current.version:
+            return False
+        with self._lock:
+            swapped = False
+            for data in self._updates():
+                snapshot = self._build(data)
+                if snapshot.version != self._snapshot.version:
+                    self._snapshot = snapshot
+                    swapped = True
+        if swapped:
+            logger.info("Swapped in data version %s (was %s)", snapshot.version, current.version)
+        return swapped
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the previous snapshot and try again next interval
+                logger.exception("Background data refresh failed")
+
+    def start(self):
+        if self._probe is None or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name='safegraph-refresh', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
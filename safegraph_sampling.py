@@ -0,0 +1,114 @@
+"""Provisional totals from a random sample of files.
+
+Files are the sampling unit: each parsed file's partial holds its exact
+state x year counts, and the counts of the files not parsed yet are
+estimated as the sample mean times the number of those files. The variance
+carries a finite-population correction, so the confidence intervals shrink
+to zero as the sample approaches every file. Partials that are already
+known exactly (reused from the store) are added as they are.
+"""
+import numpy as np
+
+from safegraph_cube import ObservationCube
+
+# Two-sided 95% normal quantile
+Z_95 = 1.96
+
+
+def _cells(partials):
+    """``(states, years, counts)`` with ``counts`` a file x state x year array"""
+    states = sorted({state for p in partials for state in p['counts']})
+    years = sorted({year for p in partials for ys in p['counts'].values() for year in ys}, key=int)
+    state_idx = {state: i for i, state in enumerate(states)}
+    year_idx = {year: j for j, year in enumerate(years)}
+
+    counts = np.zeros((len(partials), len(states), len(years)), dtype=np.float64)
+    for f, partial in enumerate(partials):
+        for state, ys in partial['counts'].items():
+            for year, n in ys.items():
+                counts[f, state_idx[state], year_idx[year]] += n
+    return states, years, counts
+
+
+def _expand(known, sample, population):
+    """Estimated total over known files plus ``population`` pending files, and its 95% half-width.
+
+    ``known`` and ``sample`` hold one row per file; the estimate is per column.
+    """
+    n = sample.shape[0]
+    mean = sample.mean(axis=0)
+    var = sample.var(axis=0, ddof=1) if n > 1 else np.zeros_like(mean)
+    half = Z_95 * population * np.sqrt((1 - n / population) * var / n)
+    return known.sum(axis=0) + population * mean, half
+
+
+def _interval(estimate, half, observed):
+    # Counts already seen are a hard lower bound
+    return [int(max(estimate - half, observed)), int(round(estimate + half))]
+
+
+def estimate(known, sample, population):
+    """Provisional dashboard data from exact ``known`` partials and a random
+    ``sample`` of the ``population`` files still being parsed.
+
+    Returns the ``summary``/``countries``/``years`` structure with point
+    estimates, an estimated ``cube``, and a ``provisional`` entry holding the
+    95% intervals. States or years that no parsed file contains yet are
+    missing, so their counts are lower bounds.
+    """
+    states, years, counts = _cells(known + sample)
+    k = len(known)
+    files = counts.reshape(len(counts), -1)
+
+    cell_est, _ = _expand(files[:k], files[k:], population)
+    state_est, state_half = _expand(counts[:k].sum(axis=2), counts[k:].sum(axis=2), population)
+    year_est, year_half = _expand(counts[:k].sum(axis=1), counts[k:].sum(axis=1), population)
+    total_est, total_half = _expand(files[:k].sum(axis=1)[:, None], files[k:].sum(axis=1)[:, None], population)
+    present = counts.sum(axis=2) > 0
+    files_est, _ = _expand(present[:k], present[k:], population)
+
+    observed = counts.sum(axis=0)
+    years_seen = observed > 0
+    data = {
+        'summary': {
+            'files_processed': k + population,
+            'total_countries': len(states),
+            'total_years': len(years),
+            'total_observations': int(round(total_est[0]))
+        },
+        'countries': {
+            state: {
+                'total_observations': int(round(state_est[i])),
+                'years_present': [int(year) for j, year in enumerate(years) if years_seen[i, j]],
+                'files_with_data': int(round(files_est[i]))
+            }
+            for i, state in enumerate(states)
+        },
+        'years': {
+            year: {
+                'total_observations': int(round(year_est[j])),
+                'countries_present': int(years_seen[:, j].sum())
+            }
+            for j, year in enumerate(years)
+        },
+        'provisional': {
+            'files_parsed': k + len(sample),
+            'files': k + population,
+            'intervals': {
+                'total_observations': _interval(total_est[0], total_half[0], observed.sum()),
+                'countries': {
+                    state: _interval(state_est[i], state_half[i], observed[i].sum())
+                    for i, state in enumerate(states)
+                },
+                'years': {
+                    year: _interval(year_est[j], year_half[j], observed[:, j].sum())
+                    for j, year in enumerate(years)
+                },
+            },
+        },
+    }
+    data['cube'] = ObservationCube(
+        tuple(states), tuple(int(year) for year in years),
+        np.rint(cell_est).astype(np.int64).reshape(len(states), len(years)), exact=False
+    )
+    return data
@@ -0,0 +1,96 @@
+"""Prefix search over geography codes, names and aliases.
+
+The index maps every prefix of every searchable term (the code, the full name,
+aliases, and each word within them) to the row ranges of the matching
+geographies in a table sorted by geography. A query is a single dict lookup,
+so its cost does not depend on the number of rows or geographies.
+"""
+import re
+
+import numpy as np
+
+STATE_NAMES = {
+    'AK': 'Alaska', 'AL': 'Alabama', 'AR': 'Arkansas', 'AS': 'American Samoa', 'AZ': 'Arizona',
+    'CA': 'California', 'CO': 'Colorado', 'CT': 'Connecticut', 'DC': 'District of Columbia',
+    'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia', 'GU': 'Guam', 'HI': 'Hawaii', 'IA': 'Iowa',
+    'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'KS': 'Kansas', 'KY': 'Kentucky',
+    'LA': 'Louisiana', 'MA': 'Massachusetts', 'MD': 'Maryland', 'ME': 'Maine', 'MI': 'Michigan',
+    'MN': 'Minnesota', 'MO': 'Missouri', 'MP': 'Northern Mariana Islands', 'MS': 'Mississippi',
+    'MT': 'Montana', 'NC': 'North Carolina', 'ND': 'North Dakota', 'NE': 'Nebraska',
+    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NV': 'Nevada', 'NY': 'New York',
+    'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'PR': 'Puerto Rico',
+    'RI': 'Rhode Island', 'SC': 'South Carolina', 'SD': 'South Dakota', 'TN': 'Tennessee',
+    'TX': 'Texas', 'UT': 'Utah', 'VA': 'Virginia', 'VI': 'U.S. Virgin Islands', 'VT': 'Vermont',
+    'WA': 'Washington', 'WI': 'Wisconsin', 'WV': 'West Virginia', 'WY': 'Wyoming'
+}
+
+ALIASES = {
+    'CA': ['Cali'],
+    'DC': ['Washington DC', 'Washington D.C.', 'D.C.'],
+    'MA': ['Mass'],
+    'MP': ['CNMI', 'Saipan'],
+    'NC': ['N. Carolina'],
+    'ND': ['N. Dakota'],
+    'NY': ['New York State', 'NYS'],
+    'PA': ['Penn', 'Penna'],
+    'PR': ['Porto Rico'],
+    'SC': ['S. Carolina'],
+    'SD': ['S. Dakota'],
+    'VI': ['Virgin Islands', 'USVI', 'US Virgin Islands'],
+    'WV': ['W. Virginia'],
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Lower-case, drop punctuation and collapse whitespace"""
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub('', text.lower())).strip()
+
+
+def _search_terms(code, names, aliases):
+    terms = {code}
+    if code in names:
+        terms.add(names[code])
+    terms.update(aliases.get(code, ()))
+    return terms
+
+
+class GeographyIndex:
+    """Prefix index from search text to row ranges of a geography-sorted table"""
+
+    def __init__(self, labels, names=STATE_NAMES, aliases=ALIASES):
+        labels = np.asarray(labels)
+        if len(labels) and (labels[1:] < labels[:-1]).any():
+            raise ValueError("labels must be sorted so each geography occupies one row range")
+        codes, starts, counts = np.unique(labels, return_index=True, return_counts=True)
+        self.ranges = {code: (int(start), int(start + count)) for code, start, count in zip(codes, starts, counts)}
+        self.size = len(labels)
+
+        matches = {}
+        for code in self.ranges:
+            for term in _search_terms(code, names, aliases):
+                words = normalize(term).split(' ')
+                # Index the prefixes of the whole term and of every trailing word run,
+                # so "york" finds New York as well as "new y"
+                for i in range(len(words)):
+                    phrase = ' '.join(words[i:])
+                    for end in range(1, len(phrase) + 1):
+                        matches.setdefault(phrase[:end], set()).add(code)
+
+        self._prefixes = {
+            prefix: tuple(sorted(self.ranges[code] for code in found))
+            for prefix, found in matches.items()
+        }
+
+    def lookup(self, query):
+        """Row ranges ``(start, stop)`` of the geographies matching ``query``"""
+        return self._prefixes.get(normalize(query), ())
+
+    def rows(self, query):
+        """Row positions matching ``query``, ready for ``DataFrame.iloc``"""
+        ranges = self.lookup(query)
+        if not ranges:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([np.arange(start, stop) for start, stop in ranges])
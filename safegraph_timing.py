@@ -0,0 +1,118 @@
+"""Lightweight timing spans for the dashboard's hot paths.
+
+``timer.span(name)`` times a block and ``timer.timed(name)`` a whole
+function; cached builders are wrapped so each call
+is recorded as a cache hit or miss. Spans are kept per thread (Streamlit runs
+each session's reruns on its own thread) for the sidebar debug panel, and
+appended to a JSON-lines log when one is configured.
+
+A disabled timer hands out one shared ``nullcontext`` and leaves decorated
+functions untouched, so instrumentation costs next to nothing when it is off.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_DISABLED = nullcontext()
+
+
+class Timer:
+    def __init__(self, enabled=False, log_path=None):
+        self.enabled = enabled or bool(log_path)
+        self.log_path = log_path
+        self._local = threading.local()
+        self._log_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Enabled by ``SAFEGRAPH_TIMING=1`` or by setting ``SAFEGRAPH_TIMING_LOG``"""
+        return cls(
+            enabled=os.environ.get('SAFEGRAPH_TIMING', '') not in ('', '0'),
+            log_path=os.environ.get('SAFEGRAPH_TIMING_LOG')
+        )
+
+    def begin(self, **context):
+        """Start a new rerun on this thread; ``context`` is added to every logged span"""
+        if not self.enabled:
+            return
+        self._local.records = []
+        self._local.depth = 0
+        self._local.misses = 0
+        self._local.context = context
+
+    def records(self):
+        """Finished spans recorded on this thread since the last :meth:`begin`"""
+        return [r for r in getattr(self._local, 'records', ()) if 'ms' in r]
+
+    def span(self, name, **fields):
+        if not self.enabled:
+            return _DISABLED
+        return self._span(name, fields)
+
+    @contextmanager
+    def _span(self, name, fields):
+        local = self._local
+        record = {'name': name, 'depth': getattr(local, 'depth', 0), **fields}
+        # Listed when the span opens, so children follow their parent. Threads that
+        # never called begin() (the background refresher) only write to the log.
+        if getattr(local, 'records', None) is not None:
+            local.records.append(record)
+        local.depth = record['depth'] + 1
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['ms'] = round((time.perf_counter() - start) * 1000, 3)
+            local.depth = record['depth']
+            self._log(record)
+
+    def _log(self, record):
+        if not self.log_path:
+            return
+        line = json.dumps({'ts': time.time(), **getattr(self._local, 'context', {}), **record}, default=str)
+        with self._log_lock, open(self.log_path, 'a') as handle:
+            handle.write(line + '\n')
+
+    def timed(self, name):
+        """Decorator recording every call of the function as a span called ``name``"""
+        def decorate(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def call(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return call
+
+        return decorate
+
+    def cached(self, cache_decorator):
+        """Wrap ``cache_decorator`` so every call is timed and marked as a hit or miss"""
+        if not self.enabled:
+            return cache_decorator
+
+        def decorate(func):
+            @functools.wraps(func)
+            def compute(*args, **kwargs):
+                # Only runs when no cache layer could answer
+                self._local.misses = getattr(self._local, 'misses', 0) + 1
+                return func(*args, **kwargs)
+
+            cached = cache_decorator(compute)
+
+            @functools.wraps(func)
+            def call(*args, **kwargs):
+                with self.span(f'cache:{func.__name__}') as record:
+                    misses = getattr(self._local, 'misses', 0)
+                    result = cached(*args, **kwargs)
+                    record['hit'] = self._local.misses == misses
+                return result
+
+            return call
+
+        return decorate
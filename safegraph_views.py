@@ -0,0 +1,150 @@
+"""View models for the dashboard tables.
+
+Every frame is built with vectorized pandas/NumPy operations and keeps its
+counts numeric, so sorting and ``idxmax`` work on numbers. Thousands
+separators and other display formatting belong to the column config at
+render time, not to these frames.
+"""
+import numpy as np
+import pandas as pd
+
+from safegraph_distinct import MARGIN_95
+
+DISTINCT_LABELS = {'placekeys': 'Distinct POIs', 'origins': 'Distinct Visitor Origins'}
+
+
+def state_table(data):
+    """Numeric per-state columns, indexed by state code"""
+    countries = data['countries']
+    states = sorted(countries)
+    n = len(states)
+    return pd.DataFrame(
+        {
+            'total_observations': np.fromiter((countries[s]['total_observations'] for s in states), np.int64, n),
+            'years_present': np.fromiter((len(countries[s]['years_present']) for s in states), np.int64, n),
+            'files_with_data': np.fromiter((countries[s]['files_with_data'] for s in states), np.int64, n),
+        },
+        index=pd.Index(states, name='State')
+    )
+
+
+def year_table(data):
+    """Numeric per-year columns, indexed by year label"""
+    years = sorted(data['years'], key=int)
+    n = len(years)
+    return pd.DataFrame(
+        {
+            'total_observations': np.fromiter((data['years'][y]['total_observations'] for y in years), np.int64, n),
+            'countries_present': np.fromiter((data['years'][y]['countries_present'] for y in years), np.int64, n),
+        },
+        index=pd.Index(years, name='Year')
+    )
+
+
+def _mean(totals, counts):
+    """Whole-number average, 0 where there is nothing to average over"""
+    totals = totals.to_numpy(dtype=np.float64)
+    counts = counts.to_numpy(dtype=np.float64)
+    return np.rint(np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0))
+
+
+def summary_frame(data):
+    """Per-state summary, largest first"""
+    table = state_table(data)
+    frame = pd.DataFrame({
+        'Country/State': table.index.to_numpy(),
+        'Total Observations': table['total_observations'].to_numpy(),
+        'Years Present': table['years_present'].to_numpy(),
+        'Avg per Year': _mean(table['total_observations'], table['years_present']),
+        'Files with Data': table['files_with_data'].to_numpy()
+    })
+    return frame.sort_values('Total Observations', ascending=False, kind='stable', ignore_index=True)
+
+
+def year_summary_frame(data):
+    """Per-year summary in year order"""
+    table = year_table(data)
+    return pd.DataFrame({
+        'Year': table.index.to_numpy(),
+        'Total Observations': table['total_observations'].to_numpy(),
+        'Countries Present': table['countries_present'].to_numpy(),
+        'Avg per Country': _mean(table['total_observations'], table['countries_present'])
+    })
+
+
+def detailed_frame(cube):
+    """Every state-year pair of the cube"""
+    return cube.long_frame().rename(columns={'State': 'Country/State'})
+
+
+def geo_frame(data, states):
+    """Totals for the selected states"""
+    table = state_table(data)
+    table = table[table.index.isin(states)]
+    return pd.DataFrame({
+        'State': table.index.to_numpy(),
+        'Observations': table['total_observations'].to_numpy(),
+        'Files with Data': table['files_with_data'].to_numpy()
+    })
+
+
+def year_frame(data, years):
+    """Totals for the selected years"""
+    table = year_table(data)
+    table = table[table.index.isin(years)]
+    return pd.DataFrame({
+        'Year': table.index.to_numpy().astype(np.int64),
+        'Observations': table['total_observations'].to_numpy(),
+        'Countries': table['countries_present'].to_numpy()
+    })
+
+
+def breakdown_frames(cube, states, years):
+    """Long and wide (heatmap) views of the cube for the selection"""
+    return cube.long_frame(states, years), cube.frame(states, years)
+
+
+def distinct_frames(distinct, states, years):
+    """Approximate distinct counts per state-year cell and across the whole selection.
+
+    Margins are two-sided 95% bounds from the sketches' standard error.
+    """
+    cells = {}
+    totals = []
+    for kind, label in DISTINCT_LABELS.items():
+        cell_states, cell_years, estimates = distinct.cell_estimates(kind, states, years)
+        estimates = np.rint(estimates.ravel())
+        cells[label] = estimates
+        cells[f'{label} ±'] = np.rint(estimates * MARGIN_95)
+        total = round(distinct.union_estimate(kind, states, years))
+        margin = round(total * MARGIN_95)
+        totals.append({'Measure': label, 'Estimate': total, 'Low': total - margin, 'High': total + margin})
+
+    cell_df = pd.DataFrame({
+        'State': np.repeat(np.array(cell_states, dtype=object), len(cell_years)),
+        'Year': np.tile(np.array(cell_years, dtype=object), len(cell_states)),
+        **cells
+    })
+    # Cells with no rows at all (a state absent in a year) are left out
+    seen = np.zeros(len(cell_df), dtype=bool)
+    for label in DISTINCT_LABELS.values():
+        seen |= cell_df[label].to_numpy() > 0
+    return cell_df[seen].reset_index(drop=True), pd.DataFrame(totals, columns=['Measure', 'Estimate', 'Low', 'High'])
+
+
+def distribution_frames(distribution, states, years, top_n=25):
+    """Busiest POIs with their error bound, and weekly-visit quantiles, for the selection"""
+    top_df, error = distribution.top_pois(states, years, top_n)
+    return top_df, error, distribution.quantile_frame(states, years)
+
+
+def completeness_frame(data, states):
+    """Share of processed files with data for the selected states"""
+    table = state_table(data)
+    table = table[table.index.isin(states)]
+    files = max(data['summary']['files_processed'], 1)
+    return pd.DataFrame({
+        'State': table.index.to_numpy(),
+        'Files with Data': table['files_with_data'].to_numpy(),
+        'Completeness %': np.round(table['files_with_data'].to_numpy() / files * 100, 2)
+    })
@@ -0,0 +1,123 @@
+"""Per-state weekly observation counts with prefix sums.
+
+``WeeklySeries`` keeps a dense state x week count matrix together with its
+cumulative sums along the week axis (with a leading zero column), so the
+total for every state between any two weeks is one subtraction per state,
+without rescanning the weekly counts.
+
+``lttb`` downsamples long series for plotting with Largest-Triangle-Three-
+Buckets, which keeps the peaks and troughs a plain stride would drop.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def week_start(day):
+    """ISO date of the Monday starting the week of ``YYYY-MM-DD`` text, or ``None``"""
+    try:
+        parsed = date.fromisoformat(day[:10])
+    except ValueError:
+        return None
+    return (parsed - timedelta(days=parsed.weekday())).isoformat()
+
+
+@dataclass(frozen=True, eq=False)
+class WeeklySeries:
+    states: tuple
+    weeks: np.ndarray
+    counts: np.ndarray
+    prefix: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        prefix = np.zeros((self.counts.shape[0], self.counts.shape[1] + 1), dtype=np.int64)
+        np.cumsum(self.counts, axis=1, out=prefix[:, 1:])
+        object.__setattr__(self, 'prefix', prefix)
+
+    @classmethod
+    def from_partials(cls, partials):
+        """Build the series from the ``weekly`` counts of ingestion partials"""
+        states = sorted({state for p in partials for state in p['weekly']})
+        weeks = sorted({week for p in partials for ws in p['weekly'].values() for week in ws})
+        state_idx = {state: i for i, state in enumerate(states)}
+        week_idx = {week: j for j, week in enumerate(weeks)}
+
+        counts = np.zeros((len(states), len(weeks)), dtype=np.int64)
+        for partial in partials:
+            for state, ws in partial['weekly'].items():
+                row = counts[state_idx[state]]
+                for week, n in ws.items():
+                    row[week_idx[week]] += n
+        return cls(tuple(states), np.array(weeks, dtype='datetime64[D]'), counts)
+
+    def _state_rows(self, states):
+        if states is None:
+            return list(self.states), np.arange(len(self.states))
+        lookup = {state: i for i, state in enumerate(self.states)}
+        states = [state for state in states if state in lookup]
+        return states, np.array([lookup[state] for state in states], dtype=np.intp)
+
+    def _week_bounds(self, start, end):
+        lo = np.searchsorted(self.weeks, np.datetime64(start, 'D'), side='left')
+        hi = np.searchsorted(self.weeks, np.datetime64(end, 'D'), side='right')
+        return lo, max(lo, hi)
+
+    def range_totals(self, start, end, states=None):
+        """Observations per state for the weeks from ``start`` to ``end`` inclusive"""
+        states, rows = self._state_rows(states)
+        lo, hi = self._week_bounds(start, end)
+        totals = self.prefix[rows, hi] - self.prefix[rows, lo]
+        return pd.Series(totals, index=pd.Index(states, name='State'), name='Observations')
+
+    def window(self, start, end, states=None):
+        """``(states, weeks, counts)`` for the weeks from ``start`` to ``end`` inclusive"""
+        states, rows = self._state_rows(states)
+        lo, hi = self._week_bounds(start, end)
+        return states, self.weeks[lo:hi], self.counts[rows, lo:hi]
+
+
+def lttb(x, y, n_out):
+    """Indices of ``n_out`` points chosen by Largest-Triangle-Three-Buckets.
+
+    ``y`` may be 2-D (series x points) when all series share ``x``; the
+    buckets are then walked once and each series gets its own selection.
+    Returns an index array of shape ``(series, n_out)`` (or ``(n_out,)`` for
+    1-D ``y``).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    squeeze = y.ndim == 1
+    y = np.atleast_2d(y)
+    n = x.shape[0]
+    if n_out >= n or n_out < 3:
+        idx = np.broadcast_to(np.arange(n), (y.shape[0], n))
+        return idx[0] if squeeze else idx
+
+    # Bucket boundaries for the interior points; first and last points are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    series = np.arange(y.shape[0])
+    selected = np.empty((y.shape[0], n_out), dtype=np.intp)
+    selected[:, 0] = 0
+    selected[:, -1] = n - 1
+
+    a = np.zeros(y.shape[0], dtype=np.intp)
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # Third vertex: the average of the next bucket (or the last point)
+        if b + 2 < len(edges):
+            nlo, nhi = edges[b + 1], edges[b + 2]
+            cx = x[nlo:nhi].mean()
+            cy = y[:, nlo:nhi].mean(axis=1)
+        else:
+            cx, cy = x[-1], y[:, -1]
+        ax, ay = x[a], y[series, a]
+        area = np.abs(
+            (ax[:, None] - cx) * (y[:, lo:hi] - ay[:, None])
+            - (ax[:, None] - x[lo:hi]) * (cy[:, None] - ay[:, None])
+        )
+        a = lo + area.argmax(axis=1)
+        selected[:, b + 1] = a
+
+    return selected[0] if squeeze else selected